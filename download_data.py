@@ -1,60 +1,97 @@
 import os
-import urllib.request
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 import tqdm
 
-pbar, count = None, 0
-desc = ""
-def show_progress(block_num, block_size, total_size):
-    global pbar
-    global count
-    global desc
-    if pbar is None:
-        pbar = tqdm.tqdm(total=total_size, unit='B', unit_scale=True, desc=desc)
-    downloaded = block_num * block_size
-    if downloaded < total_size:
-        pbar.update(downloaded - count)
-        count = downloaded
-    else:
-        pbar.close()
-        pbar = None
-        count = 0
-
-
-os.makedirs("src/Datasets/Heat", exist_ok=True)
-os.makedirs("src/Datasets/L-Shaped", exist_ok=True)
-os.makedirs("src/Datasets/Darcy", exist_ok=True)
-os.makedirs("src/Datasets/Elastic", exist_ok=True)
 
-# download the files
-print("Downloading datasets to src/Datasets/...")
+DIRS = ("src/Datasets/Heat", "src/Datasets/L-Shaped", "src/Datasets/Darcy", "src/Datasets/Elastic")
+for p in DIRS:
+    if not os.path.isdir(p):
+        os.makedirs(p, exist_ok=True)
+
+# (url, destination, description) for every file to download
+JOBS = [
+    ##### Heat ##########################################################################################################################################
+    ("https://drive.usercontent.google.com/download?id=1mSMplhocRU_0MJSwAnlXYpo4SCYoSkPk&export=download&authuser=0&confirm=t&uuid=7ef4e753-bfc3-4855-92a2-1ea57e39bf3f&at=APZUnTX9xjPEoRhinxBuhPCVk4iG:1723049906103",
+     "src/Datasets/Heat/heatequation_train.mat", "Heat Train"),
+    ("https://drive.usercontent.google.com/download?id=1JUFD9VDa2Drgd9OZ7yDAGapQ8AJKeaC1&export=download&authuser=0&confirm=t&uuid=9699c394-dae0-45e3-97ba-d5c0462695b8&at=APZUnTXCAZ_BaRILl8N2-q5n2tS_:1723050016071",
+     "src/Datasets/Heat/heatequation_test.mat", "Heat Test"),
+
+    ##### L-shaped, linear Darcy ########################################################################################################################
+    ("https://drive.usercontent.google.com/download?id=1dSjOjI-DHhmUgcFonAqLIqvQIfKouqZo&export=download&authuser=0&confirm=t&uuid=90fa75a0-f578-4d6c-856e-99081265b1d3&at=APZUnTVQ7tBgzAs96tmlIzyl9Z9u:1723137673435",
+     "src/Datasets/L-Shaped/linearDarcy_train.mat", "L-Shaped Train"),
+    ("https://drive.usercontent.google.com/download?id=1_6s-fPzTZCqpysLhfocm6qth8OBl1H-k&export=download&authuser=0&confirm=t&uuid=1a727246-2e09-4f82-a65c-fb2234f105b1&at=APZUnTVNqcWgyHb2nmhkk0jydRL9:1723137701171",
+     "src/Datasets/L-Shaped/linearDarcy_test.mat", "L-Shaped Test"),
+
+    # #### Elastic ######################################################################################################################################
+    ("https://drive.usercontent.google.com/download?id=1Ta7buACvocNWvZ1GyQLRtProJiy7yz5e&export=download&authuser=0&confirm=t&uuid=d6ebf1fe-41ae-4ce2-ac71-cef4f43574be&at=APvzH3qHdCBMB0YbxyIl82C_M-bu:1734554516547",
+     "src/Datasets/Elastic/linearElasticity_train.mat", "Elastic Train"),
+    ("https://drive.usercontent.google.com/download?id=1Ta7buACvocNWvZ1GyQLRtProJiy7yz5e&export=download&authuser=0&confirm=t&uuid=d6ebf1fe-41ae-4ce2-ac71-cef4f43574be&at=APvzH3qHdCBMB0YbxyIl82C_M-bu:1734554516547",
+     "src/Datasets/Elastic/linearElasticity_test.mat", "Elastic Test"),
+]
 
-##### Heat ##############################################################################################################################################
-ln = "https://drive.usercontent.google.com/download?id=1mSMplhocRU_0MJSwAnlXYpo4SCYoSkPk&export=download&authuser=0&confirm=t&uuid=7ef4e753-bfc3-4855-92a2-1ea57e39bf3f&at=APZUnTX9xjPEoRhinxBuhPCVk4iG:1723049906103"
-desc = "Heat Train"
-urllib.request.urlretrieve(ln, "src/Datasets/Heat/heatequation_train.mat", reporthook=show_progress)
 
-ln = "https://drive.usercontent.google.com/download?id=1JUFD9VDa2Drgd9OZ7yDAGapQ8AJKeaC1&export=download&authuser=0&confirm=t&uuid=9699c394-dae0-45e3-97ba-d5c0462695b8&at=APZUnTXCAZ_BaRILl8N2-q5n2tS_:1723050016071"
-desc = "Heat Test"
-urllib.request.urlretrieve(ln, "src/Datasets/Heat/heatequation_test.mat", reporthook=show_progress)
+# all files live on the same host, so one keep-alive session avoids a TLS handshake per file.
+# failed transfers are retried by fetch itself, which can resume them, so the adapter does not retry on top of that
+session = requests.Session()
+session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=8))
+session.headers.update({'Accept-Encoding': 'gzip, deflate'})
 
+# (connect, read) timeouts in seconds, so a stalled transfer fails and is retried instead of hanging its thread
+TIMEOUT = (10, 60)
 
-##### L-shaped, linear Darcy ##############################################################################################################################
-ln = "https://drive.usercontent.google.com/download?id=1dSjOjI-DHhmUgcFonAqLIqvQIfKouqZo&export=download&authuser=0&confirm=t&uuid=90fa75a0-f578-4d6c-856e-99081265b1d3&at=APZUnTVQ7tBgzAs96tmlIzyl9Z9u:1723137673435"
-desc = "L-Shaped Train"
-urllib.request.urlretrieve(ln, "src/Datasets/L-Shaped/linearDarcy_train.mat", reporthook=show_progress)
 
-ln = "https://drive.usercontent.google.com/download?id=1_6s-fPzTZCqpysLhfocm6qth8OBl1H-k&export=download&authuser=0&confirm=t&uuid=1a727246-2e09-4f82-a65c-fb2234f105b1&at=APZUnTVNqcWgyHb2nmhkk0jydRL9:1723137701171"
-desc = "L-Shaped Test"
-urllib.request.urlretrieve(ln, "src/Datasets/L-Shaped/linearDarcy_test.mat", reporthook=show_progress)
+def fetch(i, url, path, desc, retries=4):
+    for attempt in range(retries):
+        try:
+            # skip files that are already fully downloaded. Ask for the identity encoding so the size is the on-disk size.
+            # an error page has a Content-Length of its own, so only the size of a successful response is trusted
+            r = session.head(url, allow_redirects=True, headers={'Accept-Encoding': 'identity'}, timeout=TIMEOUT)
+            remote = int(r.headers.get('Content-Length', -1)) if r.ok else -1
+            if remote > 0 and os.path.exists(path) and os.path.getsize(path) == remote:
+                print(f"{desc}: cached")
+                return
 
-# #### Elastic ############################################################################################################################################
-ln = "https://drive.usercontent.google.com/download?id=1Ta7buACvocNWvZ1GyQLRtProJiy7yz5e&export=download&authuser=0&confirm=t&uuid=d6ebf1fe-41ae-4ce2-ac71-cef4f43574be&at=APvzH3qHdCBMB0YbxyIl82C_M-bu:1734554516547"
-desc = "Elastic Train"
-urllib.request.urlretrieve(ln, "src/Datasets/Elastic/linearElasticity_train.mat", reporthook=show_progress)
+            # resume from whatever a previous attempt left on disk
+            start = os.path.getsize(path) if os.path.exists(path) else 0
+            if remote > 0 and start > remote:
+                start = 0
 
-ln = "https://drive.usercontent.google.com/download?id=1Ta7buACvocNWvZ1GyQLRtProJiy7yz5e&export=download&authuser=0&confirm=t&uuid=d6ebf1fe-41ae-4ce2-ac71-cef4f43574be&at=APvzH3qHdCBMB0YbxyIl82C_M-bu:1734554516547"
-desc = "Elastic Test"
-urllib.request.urlretrieve(ln, "src/Datasets/Elastic/linearElasticity_test.mat", reporthook=show_progress)
+            # byte ranges refer to the encoded body, so a resumed transfer is requested uncompressed
+            headers = {'Range': f'bytes={start}-', 'Accept-Encoding': 'identity'} if start else {}
+            with session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                # 416 on a resume means nothing is left past start, i.e. the file on disk is already complete
+                if start and r.status_code == 416:
+                    size = r.headers.get('Content-Range', '').rpartition('/')[2]
+                    if not size.isdigit() or int(size) == start:
+                        print(f"{desc}: cached")
+                        return
+                    os.remove(path) # the file on disk is longer than the remote one, so start over
+                    continue
+                r.raise_for_status()
+                if r.status_code != 206: # the server sent the whole file
+                    start = 0
+                # Content-Length counts compressed bytes, but iter_content yields decompressed ones
+                total = None if 'Content-Encoding' in r.headers else start + int(r.headers.get('Content-Length', 0))
 
+                # each download owns its progress bar, so the downloads can run concurrently
+                with tqdm.tqdm(total=total, initial=start, unit='B', unit_scale=True, desc=desc, position=i) as bar, \
+                        open(path, 'ab' if start else 'wb', buffering=1 << 20) as f:
+                    for chunk in r.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+                        bar.update(len(chunk))
+            return
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout):
+            time.sleep(2 ** attempt)
+    raise IOError(f"{desc}: download failed after {retries} attempts")
+
+
+# download the files
+print("Downloading datasets to src/Datasets/...")
+with ThreadPoolExecutor(max_workers=len(JOBS)) as ex:
+    list(ex.map(lambda a: fetch(a[0], *a[1]), enumerate(JOBS)))
+session.close()
 
-print("Done!\n\n")
\ No newline at end of file
+print("Done!\n\n")
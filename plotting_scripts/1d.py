@@ -1,5 +1,3 @@
-from datetime import datetime
-
 import matplotlib.pyplot as plt
 import torch
 import matplotlib
@@ -8,6 +6,7 @@ from FunctionEncoder import TensorboardCallback, FunctionEncoder
 
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import trange
 
 import sys
@@ -15,8 +14,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.DarcyDataset import DarcySrcDataset, DarcyTgtDataset, plot_source_darcy, plot_target_darcy, plot_transformation_darcy
-from src.Datasets.HeatDataset import HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
-from src.Datasets.L_shapedDataset import LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
+from src.Datasets.HeatDataset import load_heat_mat, HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
+from src.Datasets.L_shapedDataset import load_L_mat, LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
 from src.DeepONet import DeepONet
 from src.DeepONet_CNN import DeepONet_CNN, DeepONet_2Stage_CNN_branch
 from src.MatrixMethodHelpers import compute_A, train_nonlinear_transformation, get_num_parameters, get_num_layers, predict_number_params, get_hidden_layer_size, check_parameters
@@ -28,13 +27,15 @@ from src.Datasets.QuadraticSinDataset import QuadraticDataset, SinDataset, plot_
 from src.Datasets.DerivativeDataset import CubicDerivativeDataset, CubicDataset, plot_source_cubic, plot_target_cubic_derivative, plot_transformation_derivative
 from src.Datasets.IntegralDataset import QuadraticIntegralDataset, plot_target_quadratic_integral, plot_transformation_integral
 from src.Datasets.MountainCarPoliciesDataset import MountainCarPoliciesDataset, MountainCarEpisodesDataset, plot_source_mountain_car, plot_target_mountain_car, plot_transformation_mountain_car
-from src.Datasets.ElasticPlateDataset import ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
+from src.Datasets.ElasticPlateDataset import load_elastic_mat, ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
 from src.Datasets.OperatorDataset import CombinedDataset
 
 
 
 plt.rcParams.update({'font.size': 12})
-plt.rc('text', usetex=True)
+# mathtext covers every label here, avoiding a LaTeX subprocess per label on save
+plt.rc('text', usetex=False)
+plt.rcParams["mathtext.fontset"] = "cm"
 plt.rcParams["font.family"] = "Times New Roman"
 
 
@@ -56,17 +57,20 @@ def get_dataset(dataset_type:str, test:bool, model_type:str, n_sensors:int, devi
         src_dataset = MountainCarPoliciesDataset(freeze_example_xs=freeze_example_xs, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = MountainCarEpisodesDataset(n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Elastic":
-        src_dataset = ElasticPlateBoudaryForceDataset(freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = ElasticPlateDisplacementDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_elastic_mat(test) # parsed once for both datasets
+        src_dataset = ElasticPlateBoudaryForceDataset(mat=mat, freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = ElasticPlateDisplacementDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Darcy":
         src_dataset = DarcySrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = DarcyTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Heat":
-        src_dataset = HeatSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = HeatTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_heat_mat(test) # parsed once for both datasets
+        src_dataset = HeatSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = HeatTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "LShaped":
-        src_dataset = LSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = LTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_L_mat(test) # parsed once for both datasets
+        src_dataset = LSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = LTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     else:
         raise ValueError(f"Unknown dataset type: {dataset_type}")
     combined_dataset = CombinedDataset(src_dataset, tgt_dataset, calibration_only=(model_type == "matrix"))
@@ -124,8 +128,9 @@ b2b_subdirs = [f"{b2b_dir}/{subdir}" for subdir in os.listdir(b2b_dir) if os.pat
 
 
 # next, get the oldest subdir by when it was created
-deeponet_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
-b2b_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
+# subdirs are named %Y-%m-%d_%H-%M-%S, which sorts chronologically as a plain string
+deeponet_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
+b2b_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
 deeponet_subdir = deeponet_subdirs[args.seed-1]
 b2b_subdir = b2b_subdirs[args.seed-1]
 
@@ -171,7 +176,7 @@ src_model = FunctionEncoder(input_size=src_dataset.input_size,
 tgt_model = FunctionEncoder(input_size=tgt_dataset.input_size,
                             output_size=tgt_dataset.output_size,
                             data_type=tgt_dataset.data_type,
-                            n_basis=n_basis+1, # note this makes debugging way easier.
+                            n_basis=n_basis+1, # must match training, the saved tgt model and A both have the extra basis function
                             method=args.train_method,
                             model_kwargs={"n_layers":n_layers, "hidden_size":hidden_size},
                             ).to(device)
@@ -185,92 +190,156 @@ if transformation_type == "nonlinear":
     a_model = torch.nn.Sequential(*layers).to(device)
     b2b_model["A"] = a_model
 else:
-    b2b_model["A"] = torch.rand(tgt_model.n_basis, src_model.n_basis).to(device)
+    # placeholder so the parameter count below is checked, A itself is loaded from disk
+    b2b_model["A"] = torch.empty(tgt_model.n_basis, src_model.n_basis, device=device)
 n_params = get_num_parameters(b2b_model)
 predict_n_params = predict_number_params("matrix", combined_dataset.n_examples_per_sample, n_basis, hidden_size, n_layers, src_dataset.input_size, src_dataset.output_size, tgt_dataset.input_size, tgt_dataset.output_size, transformation_type, dataset_type)
 assert n_params == predict_n_params, f"Number of parameters is not consistent, expected {predict_n_params}, got {n_params}."
 
 
-# NEXT CREATE DEEPONET MODEL
-hidden_size = get_hidden_layer_size(target_n_parameters=args.approximate_number_paramaters,
-                                    model_type="deeponet",
-                                    n_basis=n_basis, n_layers=n_layers,
-                                    src_input_space=src_dataset.input_size,
-                                    src_output_space=src_dataset.output_size,
-                                    tgt_input_space=tgt_dataset.input_size,
-                                    tgt_output_space=tgt_dataset.output_size,
-                                    transformation_type=transformation_type,
-                                    n_sensors=combined_dataset.n_examples_per_sample,
-                                    dataset_type=dataset_type,)
-
-deeponet_model = DeepONet(input_size_tgt=tgt_dataset.input_size[0],
-                    output_size_tgt=tgt_dataset.output_size[0],
-                    input_size_src=src_dataset.input_size[0],
-                    output_size_src=src_dataset.output_size[0],
-                    n_input_sensors=combined_dataset.n_examples_per_sample,
-                    p=n_basis,
-                    n_layers=n_layers,
-                    hidden_size=hidden_size,
-                    ).to(device)
-n_params = get_num_parameters(deeponet_model)
-predict_n_params = predict_number_params("deeponet", combined_dataset.n_examples_per_sample, n_basis, hidden_size, n_layers, src_dataset.input_size, src_dataset.output_size, tgt_dataset.input_size, tgt_dataset.output_size, transformation_type, dataset_type)
-assert n_params == predict_n_params, f"Number of parameters is not consistent, expected {predict_n_params}, got {n_params}."
-
-# load models
-b2b_model["src"].load_state_dict(torch.load(f"{args.load_path_matrix}/src_model.pth", weights_only=True, map_location=device))
-b2b_model["tgt"].load_state_dict(torch.load(f"{args.load_path_matrix}/tgt_model.pth", weights_only=True, map_location=device))
+# load models. The checkpoints are independent reads, so they are loaded concurrently.
+# deeponet is only needed after the search, so its weights stay on the cpu until then
+with ThreadPoolExecutor(max_workers=4) as executor:
+    checkpoints = {name: executor.submit(torch.load, path, weights_only=True, map_location=map_location)
+                   for name, path, map_location in [("src", f"{args.load_path_matrix}/src_model.pth", device),
+                                                    ("tgt", f"{args.load_path_matrix}/tgt_model.pth", device),
+                                                    ("A", f"{args.load_path_matrix}/A.pth", device),
+                                                    ("deeponet", f"{args.load_path_deeponet}/model.pth", "cpu")]}
+    checkpoints = {name: future.result() for name, future in checkpoints.items()}
+b2b_model["src"].load_state_dict(checkpoints["src"])
+b2b_model["tgt"].load_state_dict(checkpoints["tgt"])
 if transformation_type == "linear":
-    b2b_model["A"] = torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device)
+    b2b_model["A"] = checkpoints["A"]
 else:
-    b2b_model["A"].load_state_dict(torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device))
+    b2b_model["A"].load_state_dict(checkpoints["A"])
+deeponet_checkpoint = checkpoints["deeponet"]
+del checkpoints
 
-deeponet_model.load_state_dict(torch.load(f"{args.load_path_deeponet}/model.pth", weights_only=True, map_location=device))
 
 
+# maps example data to target predictions, source encoder -> A -> target decoder
+def forward_b2b(example_xs, example_ys, xs):
+    src_rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
+    if transformation_type == "linear":
+        # apply A inside the basis combination in a single contraction. tgt has no average function, so this matches predict
+        Gs = b2b_model["tgt"].model(xs)
+        y_hats = torch.einsum("fdmk,kj,fj->fdm", Gs, b2b_model["A"], src_rep)
+    else:
+        y_hats = b2b_model["tgt"].predict(xs, b2b_model["A"](src_rep))
+    return y_hats
+
+# the search calls the pipeline many times with the same shapes, so compile it.
+# Outputs of the compiled function may be overwritten by the next call, so clone anything that is kept.
+compiled_forward_b2b = torch.compile(forward_b2b, mode="reduce-overhead", dynamic=False)
+
 
 ##############   Evaluate    ###################
 with torch.no_grad():
     
-    hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info = None, None, None, None, None
-    b2b_loss = -1000000
-
-    for search_step in trange(1000):
-        # plot transformation for all model types
-        example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample(device, plot_only=False)
+    # the loss and index of the hardest function of every step, kept on the device so the loop never waits on a device->host copy.
+    # the batches themselves are not kept. The rng state before every step is saved instead, so the winning batch can be drawn again
+    candidate_losses, candidate_indicies, rng_states = [], [], []
+    use_cuda = torch.device(device).type == "cuda"
+
+    # search 1000 batches, evaluating several at once so each forward pass is larger.
+    # TF32 matmuls are accurate enough to rank functions by loss. The plotted predictions below are computed in full fp32
+    # the previous setting is restored afterwards, also if the search raises
+    previous_allow_tf32 = torch.backends.cuda.matmul.allow_tf32
+    torch.backends.cuda.matmul.allow_tf32 = True
+    try:
+        n_draws_per_step = 10
+        for search_step in trange(1000 // n_draws_per_step):
+            # plot transformation for all model types
+            rng_states.append((torch.get_rng_state(), torch.cuda.get_rng_state(device) if use_cuda else None))
+            example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample_batch(n_draws_per_step, device)
         
-        # get output space predictions
-        rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
-        if transformation_type == "linear":
-            rep = rep @ b2b_model["A"].T
-        else:
-            rep = b2b_model["A"](rep)
-        b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
-
-        # compute the loss for each function
-        losses = ((b2b_y_hats - ys)**2).mean(dim=(1,2))
-
-        # get the hardest example
-        max_index = torch.argmax(losses)
-        if losses[max_index] > b2b_loss:
-            hardest_example_xs = example_xs[max_index:max_index+1]
-            hardest_example_ys = example_ys[max_index:max_index+1]
-            hardest_xs = xs[max_index:max_index+1]
-            hardest_ys = ys[max_index:max_index+1]
-            hardest_info = {key: value[max_index:max_index+1] for key, value in info.items()}
-            b2b_loss = losses[max_index]
-
-    # use hardest data
-    example_xs, example_ys, xs, ys, info = hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info
+            # get output space predictions
+            try:
+                b2b_y_hats = compiled_forward_b2b(example_xs, example_ys, xs)
+            except (torch._dynamo.exc.BackendCompilerFailed, RuntimeError) as e: # compilation is not supported everywhere, e.g. without a c++ compiler
+                if compiled_forward_b2b is forward_b2b:
+                    raise
+                # a genuine error in the model is not a compile failure, it fails again in eager mode and is raised from there
+                print("torch.compile failed, falling back to eager mode:", e)
+                compiled_forward_b2b = forward_b2b
+                b2b_y_hats = compiled_forward_b2b(example_xs, example_ys, xs)
+
+            # compute the loss for each function
+            losses = ((b2b_y_hats - ys)**2).mean(dim=(1,2))
+
+            # get the hardest example of this step
+            max_index = torch.argmax(losses).view(1)
+            candidate_losses.append(losses.index_select(0, max_index))
+            candidate_indicies.append(max_index)
+    finally:
+        torch.backends.cuda.matmul.allow_tf32 = previous_allow_tf32
+
+    # use hardest data. This is the only sync with the device
+    hardest_step = torch.argmax(torch.cat(candidate_losses)).item()
+
+    # restore the rng state of the hardest step and draw its batch again, then slice out the hardest function once.
+    # index_select keeps the function dimension
+    cpu_rng_state, cuda_rng_state = rng_states[hardest_step]
+    torch.set_rng_state(cpu_rng_state)
+    if use_cuda:
+        torch.cuda.set_rng_state(cuda_rng_state, device)
+    example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample_batch(n_draws_per_step, device)
+    max_index = candidate_indicies[hardest_step]
+    example_xs, example_ys = example_xs.index_select(0, max_index), example_ys.index_select(0, max_index)
+    xs, ys = xs.index_select(0, max_index), ys.index_select(0, max_index)
+    # info is only read by .item() for the titles, so move it to the cpu in one go
+    info = {key: value.index_select(0, max_index).cpu() for key, value in info.items()}
+
+    # NEXT CREATE DEEPONET MODEL. It is only needed for the hardest example, so it is built after the search
+    hidden_size = get_hidden_layer_size(target_n_parameters=args.approximate_number_paramaters,
+                                        model_type="deeponet",
+                                        n_basis=n_basis, n_layers=n_layers,
+                                        src_input_space=src_dataset.input_size,
+                                        src_output_space=src_dataset.output_size,
+                                        tgt_input_space=tgt_dataset.input_size,
+                                        tgt_output_space=tgt_dataset.output_size,
+                                        transformation_type=transformation_type,
+                                        n_sensors=combined_dataset.n_examples_per_sample,
+                                        dataset_type=dataset_type,)
+
+    deeponet_model = DeepONet(input_size_tgt=tgt_dataset.input_size[0],
+                        output_size_tgt=tgt_dataset.output_size[0],
+                        input_size_src=src_dataset.input_size[0],
+                        output_size_src=src_dataset.output_size[0],
+                        n_input_sensors=combined_dataset.n_examples_per_sample,
+                        p=n_basis,
+                        n_layers=n_layers,
+                        hidden_size=hidden_size,
+                        ).to(device)
+    n_params = get_num_parameters(deeponet_model)
+    predict_n_params = predict_number_params("deeponet", combined_dataset.n_examples_per_sample, n_basis, hidden_size, n_layers, src_dataset.input_size, src_dataset.output_size, tgt_dataset.input_size, tgt_dataset.output_size, transformation_type, dataset_type)
+    assert n_params == predict_n_params, f"Number of parameters is not consistent, expected {predict_n_params}, got {n_params}."
+
+    deeponet_model.load_state_dict(deeponet_checkpoint)
+    del deeponet_checkpoint
 
     # compute losses
     deeponet_y_hats = deeponet_model.forward(example_xs, example_ys, xs)
-    rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
+    src_rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
     if transformation_type == "linear":
-        rep = rep @ b2b_model["A"].T
+        rep = src_rep @ b2b_model["A"].T
+    else:
+        rep = b2b_model["A"](src_rep)
+    if torch.device(device).type == "cuda":
+        # the source and target predictions are independent, so run them on separate streams to overlap them
+        main_stream = torch.cuda.current_stream(device)
+        src_stream, tgt_stream = torch.cuda.Stream(device), torch.cuda.Stream(device)
+        src_stream.wait_stream(main_stream)
+        tgt_stream.wait_stream(main_stream)
+        with torch.cuda.stream(tgt_stream):
+            b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
+        with torch.cuda.stream(src_stream):
+            b2b_example_y_hats = b2b_model["src"].predict(example_xs, src_rep)
+        main_stream.wait_stream(src_stream)
+        main_stream.wait_stream(tgt_stream)
     else:
-        rep = b2b_model["A"](rep)
-    b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
-    b2b_example_y_hats = b2b_model["src"].predict_from_examples(example_xs, example_ys, example_xs, method=args.train_method)
+        b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
+        b2b_example_y_hats = b2b_model["src"].predict(example_xs, src_rep)
 
     # PLOT ########################
     size = 5
@@ -279,27 +348,45 @@ with torch.no_grad():
     deeponet_color = colors["deeponet"]
     deeponet_label = labels["deeponet"]
 
-    # sort example data based on xs
-    example_xs, indicies = torch.sort(example_xs, dim=-2)
-    example_ys = example_ys.gather(dim=-2, index=indicies)
-    b2b_example_y_hats = b2b_example_y_hats.gather(dim=-2, index=indicies)
+    # sort example data based on xs. Inputs and outputs are 1D, so everything sharing an ordering is gathered at once
+    indicies = example_xs.argsort(dim=-2)
+    example_xs, example_ys, b2b_example_y_hats = torch.stack([example_xs, example_ys, b2b_example_y_hats]).gather(dim=-2, index=indicies.expand(3, -1, -1, -1)).unbind(0)
 
     # sort data based on xs
-    xs, indicies = torch.sort(xs, dim=-2)
-    ys = ys.gather(dim=-2, index=indicies)
-    b2b_y_hats = b2b_y_hats.gather(dim=-2, index=indicies)
-    deeponet_y_hats = deeponet_y_hats.gather(dim=-2, index=indicies)
+    indicies = xs.argsort(dim=-2)
+    xs, ys, b2b_y_hats, deeponet_y_hats = torch.stack([xs, ys, b2b_y_hats, deeponet_y_hats]).gather(dim=-2, index=indicies.expand(4, -1, -1, -1)).unbind(0)
+
+    # compute the errors on the device, then move everything to the cpu once, rather than once per plotted line
+    src_error = (b2b_example_y_hats - example_ys).abs_().cpu().numpy()
+    b2b_error = (b2b_y_hats - ys).abs_().cpu().numpy()
+    deeponet_error = (deeponet_y_hats - ys).abs_().cpu().numpy()
+    example_xs, example_ys, b2b_example_y_hats = example_xs.cpu().numpy(), example_ys.cpu().numpy(), b2b_example_y_hats.cpu().numpy()
+    xs, ys, b2b_y_hats, deeponet_y_hats = xs.cpu().numpy(), ys.cpu().numpy(), b2b_y_hats.cpu().numpy(), deeponet_y_hats.cpu().numpy()
     print("Saving to logdir:", logdir)
 
+    # build the figure once and clear its axes for every row
+    fig = plt.figure(figsize=(4.25 * size, 1. * size), dpi=300)
+    gridspec = fig.add_gridspec(1, 5, width_ratios=[1, 1, 0.05, 1, 1])
+    axs = gridspec.subplots()
+
+    # add line between ax2 and ax3. It is placed from the untouched gridspec positions, because
+    # tight_layout moves the axes and the figure is reused for every row
+    left = axs[1].get_position().xmax 
+    right = axs[3].get_position().xmin - 0.025
+    xpos = (left+right) / 2
+    top = axs[1].get_position().ymax + 0.08
+    bottom = axs[1].get_position().ymin - 0.08
+    line1 = matplotlib.lines.Line2D((xpos, xpos), (bottom, top),transform=fig.transFigure, color="black", linestyle="--", lw=2)
+    fig.lines = line1, 
+
     for row in range(example_xs.shape[0]):
-        fig = plt.figure(figsize=(4.25 * size, 1. * size), dpi=300)
-        gridspec = fig.add_gridspec(1, 5, width_ratios=[1, 1, 0.05, 1, 1])
-        axs = gridspec.subplots()
+        for ax in axs:
+            ax.cla()
 
         # plot source space
         ax = axs[0]
-        ax.plot(example_xs[row].cpu(), example_ys[row].cpu(), label="Groundtruth", color="black")
-        ax.plot(example_xs[row].cpu(), b2b_example_y_hats[row].cpu(), label=b2b_label, color=b2b_color)
+        ax.plot(example_xs[row], example_ys[row], label="Groundtruth", color="black")
+        ax.plot(example_xs[row], b2b_example_y_hats[row], label=b2b_label, color=b2b_color)
         
         # title depending on data
         if dataset_type == "Derivative":
@@ -315,8 +402,7 @@ with torch.no_grad():
 
         # plot source error
         ax = axs[1]
-        error = (b2b_example_y_hats[row] - example_ys[row]).abs()
-        ax.plot(example_xs[row].cpu(), error.cpu(), label=b2b_label, color=b2b_color)
+        ax.plot(example_xs[row], src_error[row], label=b2b_label, color=b2b_color)
         ax.set_xlabel("$x$")
         ax.set_ylabel(f"$\\vert \hat{{f}}(x) - f(x) \\vert$")
         ax.set_yscale("log")
@@ -332,9 +418,9 @@ with torch.no_grad():
 
         # plot
         ax = axs[3]
-        ax.plot(xs[row].cpu(), ys[row].cpu(), label="Groundtruth", color="black")
-        ax.plot(xs[row].cpu(), b2b_y_hats[row].cpu(), label=b2b_label, color=b2b_color)
-        ax.plot(xs[row].cpu(), deeponet_y_hats[row].cpu(), label=deeponet_label, color=deeponet_color, ls="--")
+        ax.plot(xs[row], ys[row], label="Groundtruth", color="black")
+        ax.plot(xs[row], b2b_y_hats[row], label=b2b_label, color=b2b_color)
+        ax.plot(xs[row], deeponet_y_hats[row], label=deeponet_label, color=deeponet_color, ls="--")
         
         if dataset_type == "Derivative":
             title = f"$3*{info['As'][row].item():.2f}x^2 + 2*{info['Bs'][row].item():.2f}x + {info['Cs'][row].item():.2f}$"
@@ -359,29 +445,18 @@ with torch.no_grad():
 
         # plot absolute error
         ax = axs[4]
-        error = (b2b_y_hats[row] - ys[row]).abs()
-        ax.plot(xs[row].cpu(), error.cpu(), label=b2b_label, color=b2b_color)
-        error = (deeponet_y_hats[row] - ys[row]).abs()
-        ax.plot(xs[row].cpu(), error.cpu(), label=deeponet_label, color=deeponet_color)
+        ax.plot(xs[row], b2b_error[row], label=b2b_label, color=b2b_color)
+        ax.plot(xs[row], deeponet_error[row], label=deeponet_label, color=deeponet_color)
         ax.set_xlabel("$y$")
         ax.set_ylabel(f"$\\vert \hat{{\\mathcal{{T}}}}f(y) - \\mathcal{{T}}f(y) \\vert$")
         ax.set_yscale("log")
         title = f"Absolute Error"
         ax.set_title(title)
 
-        # add line between ax2 and ax3
-        left = axs[1].get_position().xmax 
-        right = axs[3].get_position().xmin - 0.025
-        xpos = (left+right) / 2
-        top = axs[1].get_position().ymax + 0.08
-        bottom = axs[1].get_position().ymin - 0.08
-        line1 = matplotlib.lines.Line2D((xpos, xpos), (bottom, top),transform=fig.transFigure, color="black", linestyle="--", lw=2)
-        fig.lines = line1, 
-
-
         plt.tight_layout()
         plot_name = f"{logdir}/{dataset_type}_comparison_{row}.pdf"
-        plt.savefig(plot_name)
+        fig.savefig(plot_name)
+    plt.close(fig)
 
 
 
@@ -16,8 +16,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.DarcyDataset import DarcySrcDataset, DarcyTgtDataset, plot_source_darcy, plot_target_darcy, plot_transformation_darcy
-from src.Datasets.HeatDataset import HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
-from src.Datasets.L_shapedDataset import LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
+from src.Datasets.HeatDataset import load_heat_mat, HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
+from src.Datasets.L_shapedDataset import load_L_mat, LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
 from src.DeepONet import DeepONet
 from src.DeepONet_CNN import DeepONet_CNN, DeepONet_2Stage_CNN_branch
 from src.MatrixMethodHelpers import compute_A, train_nonlinear_transformation, get_num_parameters, get_num_layers, predict_number_params, get_hidden_layer_size, check_parameters
@@ -29,7 +29,7 @@ from src.Datasets.QuadraticSinDataset import QuadraticDataset, SinDataset, plot_
 from src.Datasets.DerivativeDataset import CubicDerivativeDataset, CubicDataset, plot_source_cubic, plot_target_cubic_derivative, plot_transformation_derivative
 from src.Datasets.IntegralDataset import QuadraticIntegralDataset, plot_target_quadratic_integral, plot_transformation_integral
 from src.Datasets.MountainCarPoliciesDataset import MountainCarPoliciesDataset, MountainCarEpisodesDataset, plot_source_mountain_car, plot_target_mountain_car, plot_transformation_mountain_car
-from src.Datasets.ElasticDataError import ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
+from src.Datasets.ElasticDataError import load_elastic_mat, ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
 from src.Datasets.OperatorDataset import CombinedDataset
 
 
@@ -57,17 +57,20 @@ def get_dataset(dataset_type:str, test:bool, model_type:str, n_sensors:int, devi
         src_dataset = MountainCarPoliciesDataset(freeze_example_xs=freeze_example_xs, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = MountainCarEpisodesDataset(n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Elastic":
-        src_dataset = ElasticPlateBoudaryForceDataset(freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = ElasticPlateDisplacementDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_elastic_mat(test) # parsed once for both datasets
+        src_dataset = ElasticPlateBoudaryForceDataset(mat=mat, freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = ElasticPlateDisplacementDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Darcy":
         src_dataset = DarcySrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = DarcyTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Heat":
-        src_dataset = HeatSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = HeatTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_heat_mat(test) # parsed once for both datasets
+        src_dataset = HeatSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = HeatTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "LShaped":
-        src_dataset = LSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = LTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_L_mat(test) # parsed once for both datasets
+        src_dataset = LSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = LTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     else:
         raise ValueError(f"Unknown dataset type: {dataset_type}")
     combined_dataset = CombinedDataset(src_dataset, tgt_dataset, calibration_only=(model_type == "matrix"))
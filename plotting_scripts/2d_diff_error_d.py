@@ -1,9 +1,6 @@
-from datetime import datetime
-
 import matplotlib.pyplot as plt
 import torch
 import matplotlib
-import copy
 
 from FunctionEncoder import TensorboardCallback, FunctionEncoder
 
@@ -16,8 +13,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.DarcyDataset import DarcySrcDataset, DarcyTgtDataset, plot_source_darcy, plot_target_darcy, plot_transformation_darcy
-from src.Datasets.HeatDataset import HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
-from src.Datasets.L_shapedDataset import LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
+from src.Datasets.HeatDataset import load_heat_mat, HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
+from src.Datasets.L_shapedDataset import load_L_mat, LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
 from src.DeepONet import DeepONet
 from src.DeepONet_CNN import DeepONet_CNN, DeepONet_2Stage_CNN_branch
 from src.MatrixMethodHelpers import compute_A, train_nonlinear_transformation, get_num_parameters, get_num_layers, predict_number_params, get_hidden_layer_size, check_parameters
@@ -29,7 +26,7 @@ from src.Datasets.QuadraticSinDataset import QuadraticDataset, SinDataset, plot_
 from src.Datasets.DerivativeDataset import CubicDerivativeDataset, CubicDataset, plot_source_cubic, plot_target_cubic_derivative, plot_transformation_derivative
 from src.Datasets.IntegralDataset import QuadraticIntegralDataset, plot_target_quadratic_integral, plot_transformation_integral
 from src.Datasets.MountainCarPoliciesDataset import MountainCarPoliciesDataset, MountainCarEpisodesDataset, plot_source_mountain_car, plot_target_mountain_car, plot_transformation_mountain_car
-from src.Datasets.ElasticDataError import ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
+from src.Datasets.ElasticDataError import load_elastic_mat, ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
 from src.Datasets.OperatorDataset import CombinedDataset
 
 
@@ -57,17 +54,20 @@ def get_dataset(dataset_type:str, test:bool, model_type:str, n_sensors:int, devi
         src_dataset = MountainCarPoliciesDataset(freeze_example_xs=freeze_example_xs, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = MountainCarEpisodesDataset(n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Elastic":
-        src_dataset = ElasticPlateBoudaryForceDataset(freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = ElasticPlateDisplacementDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_elastic_mat(test) # parsed once for both datasets
+        src_dataset = ElasticPlateBoudaryForceDataset(mat=mat, freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = ElasticPlateDisplacementDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Darcy":
         src_dataset = DarcySrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = DarcyTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Heat":
-        src_dataset = HeatSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = HeatTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_heat_mat(test) # parsed once for both datasets
+        src_dataset = HeatSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = HeatTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "LShaped":
-        src_dataset = LSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = LTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_L_mat(test) # parsed once for both datasets
+        src_dataset = LSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = LTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     else:
         raise ValueError(f"Unknown dataset type: {dataset_type}")
     combined_dataset = CombinedDataset(src_dataset, tgt_dataset, calibration_only=(model_type == "matrix"))
@@ -119,13 +119,14 @@ logdir = f"{args.logdir}/{dataset_type}"
 # next, get all subdirs for both deeponet and b2b (matrix)
 deeponet_dir = f"{logdir}/deeponet"
 b2b_dir = f"{logdir}/matrix_least_squares"
-deeponet_subdirs = [f"{deeponet_dir}/{subdir}" for subdir in os.listdir(deeponet_dir) if os.path.isdir(f"{deeponet_dir}/{subdir}")]
-b2b_subdirs = [f"{b2b_dir}/{subdir}" for subdir in os.listdir(b2b_dir) if os.path.isdir(f"{b2b_dir}/{subdir}")]
+deeponet_subdirs = [f.path for f in os.scandir(deeponet_dir) if f.is_dir()]
+b2b_subdirs = [f.path for f in os.scandir(b2b_dir) if f.is_dir()]
 
 
 # next, get the oldest subdir by when it was created
-deeponet_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
-b2b_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
+# subdirs are named %Y-%m-%d_%H-%M-%S, which sorts chronologically as a plain string
+deeponet_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
+b2b_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
 deeponet_subdir = deeponet_subdirs[args.seed-1]
 b2b_subdir = b2b_subdirs[args.seed-1]
 
@@ -183,10 +184,9 @@ b2b_model = {"src": src_model, "tgt": tgt_model}
 # optionally add neural network to transform between spaces for nonlinear operator
 if transformation_type == "nonlinear":
     transformation_input_size = src_model.n_basis if src_model is not None else src_dataset.output_size[0]
-    layers = [torch.nn.Linear(transformation_input_size, hidden_size),torch.nn.ReLU()]
-    for layer in range(n_layers - 2):
-        layers += [torch.nn.Linear(hidden_size, hidden_size), torch.nn.ReLU()]
-    layers += [torch.nn.Linear(hidden_size, tgt_model.n_basis)]
+    layers = [torch.nn.Linear(transformation_input_size, hidden_size), torch.nn.ReLU(),
+              *(layer for _ in range(n_layers - 2) for layer in (torch.nn.Linear(hidden_size, hidden_size), torch.nn.ReLU())),
+              torch.nn.Linear(hidden_size, tgt_model.n_basis)]
     a_model = torch.nn.Sequential(*layers).to(device)
     b2b_model["A"] = a_model
 else:
@@ -224,72 +224,93 @@ assert n_params == predict_n_params, f"Number of parameters is not consistent, e
 
 # load models
 if b2b_model["src"] is not None:
-    b2b_model["src"].load_state_dict(torch.load(f"{args.load_path_matrix}/src_model.pth", weights_only=True, map_location=device))
-b2b_model["tgt"].load_state_dict(torch.load(f"{args.load_path_matrix}/tgt_model.pth", weights_only=True, map_location=device))
+    b2b_model["src"].load_state_dict(torch.load(f"{args.load_path_matrix}/src_model.pth", weights_only=True, map_location=device, mmap=True))
+b2b_model["tgt"].load_state_dict(torch.load(f"{args.load_path_matrix}/tgt_model.pth", weights_only=True, map_location=device, mmap=True))
 if transformation_type == "linear":
-    b2b_model["A"] = torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device)
+    b2b_model["A"] = torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device, mmap=True)
 else:
-    b2b_model["A"].load_state_dict(torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device))
+    b2b_model["A"].load_state_dict(torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device, mmap=True))
 
-deeponet_model.load_state_dict(torch.load(f"{args.load_path_deeponet}/model.pth", weights_only=True, map_location=device))
+deeponet_model.load_state_dict(torch.load(f"{args.load_path_deeponet}/model.pth", weights_only=True, map_location=device, mmap=True))
 
 
 
 ##############   Evaluate    ###################
-# Define denormalize function before the search loop
-def denormalize(y):
-    mean, std = (2.8366714104777202e-05, 4.263603113940917e-05)
-    return y * std + mean
+# these match the normalization in ElasticPlateDisplacementDataset
+displacement_mean, displacement_std = (2.8366714104777202e-05, 4.263603113940917e-05)
 
-with torch.no_grad():
-    hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info = None, None, None, None, None
-    max_relative_loss = -1000000
-    hardest_index = -1
-    found_valid_example = False
-
-    for search_step in trange(1000):
-        example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample(device, plot_only=False)
-        
-        # Only consider samples that have at least one index in the range 100-150
-        valid_indices_mask = (info['function_indicies'] >= 100) & (info['function_indicies'] <= 150)
-        if not valid_indices_mask.any():
-            continue
+# the constants are the defaults, so callers only pass the normalized tensor
+def denormalize(y: torch.Tensor, mean: float = displacement_mean, std: float = displacement_std) -> torch.Tensor:
+    return y * std + mean
 
-        found_valid_example = True
+# mean absolute error of each function relative to its maximum displacement, both denormalized.
+# denormalize(a) - denormalize(b) = std * (a - b), so the error is computed without denormalizing the prediction.
+def compute_relative_losses(y_hats: torch.Tensor, ys: torch.Tensor, mean: float, std: float) -> torch.Tensor:
+    errors = (y_hats - ys).abs_().mean(dim=[1, 2]) * std
+    max_displacements = (ys * std + mean).abs_().amax(dim=[1, 2])
+    return errors / max_displacements
+
+# the search calls deeponet many times with the same shapes, so compile it.
+# Outputs of the compiled model may be overwritten by the next call, so clone anything that is kept.
+compiled_deeponet_model = torch.compile(deeponet_model, mode="reduce-overhead", dynamic=False)
+
+with torch.inference_mode():
+    # the loss and index of the hardest function of every step, kept on the device so the loop never waits on a device->host copy.
+    # only the function index of the hardest example is needed afterwards, so none of the batch data is kept
+    candidate_losses, candidate_indicies = [], []
+
+    # search 1000 batches, evaluating several at once so each forward pass is larger.
+    # TF32 matmuls are accurate enough to rank functions by loss. The linearity checks and final losses below are computed in full fp32
+    # the previous setting is restored afterwards, also if the search raises
+    previous_allow_tf32 = torch.backends.cuda.matmul.allow_tf32
+    torch.backends.cuda.matmul.allow_tf32 = True
+    try:
+        n_draws_per_step = 10
+        batch_buffers = None
+        for search_step in trange(1000 // n_draws_per_step):
+            # every batch has the same shape and nothing from the previous one is kept, so reuse its tensors
+            example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample_batch(n_draws_per_step, device, out=batch_buffers)
+            batch_buffers = (example_xs, example_ys, xs, ys)
         
-        # Get DeepONet predictions
-        deeponet_y_hats = deeponet_model.forward(example_xs, example_ys, xs)
+            # Only consider functions with an index in the range 100-150
+            valid_indices_mask = (info['function_indicies'] >= 100) & (info['function_indicies'] <= 150)
         
-        # Denormalize predictions and ground truth
-        ys_denorm = denormalize(ys)
-        deeponet_y_hats_denorm = denormalize(deeponet_y_hats)
+            # Get DeepONet predictions
+            try:
+                deeponet_y_hats = compiled_deeponet_model(example_xs, example_ys, xs)
+            except (torch._dynamo.exc.BackendCompilerFailed, RuntimeError) as e: # compilation is not supported everywhere, e.g. without a c++ compiler
+                if compiled_deeponet_model is deeponet_model:
+                    raise
+                # a genuine error in the model is not a compile failure, it fails again in eager mode and is raised from there
+                print("torch.compile failed, falling back to eager mode:", e)
+                compiled_deeponet_model = deeponet_model
+                deeponet_y_hats = compiled_deeponet_model(example_xs, example_ys, xs)
         
-        # Compute relative losses for each function
-        max_displacements = ys_denorm.abs().max(dim=1)[0].max(dim=1)[0]  # Maximum displacement for each sample
-        relative_losses = torch.mean(torch.abs(deeponet_y_hats_denorm - ys_denorm), dim=(1,2)) / max_displacements
-
-        # Only consider losses for indices in our target range
-        relative_losses[~valid_indices_mask] = -float('inf')  # Set losses for invalid indices to -inf
-
-        # get the hardest example based on relative loss
-        max_index = torch.argmax(relative_losses)
-        if relative_losses[max_index] > max_relative_loss:
-            hardest_example_xs = example_xs[max_index:max_index+1]
-            hardest_example_ys = example_ys[max_index:max_index+1]
-            hardest_xs = xs[max_index:max_index+1]
-            hardest_ys = ys[max_index:max_index+1]
-            hardest_info = {key: value[max_index:max_index+1] for key, value in info.items()}
-            max_relative_loss = relative_losses[max_index]
-            hardest_index = search_step
-
-    if not found_valid_example:
+            # Compute relative losses for each function
+            relative_losses = compute_relative_losses(deeponet_y_hats, ys, displacement_mean, displacement_std)
+
+            # Only consider losses for indices in our target range
+            relative_losses = torch.where(valid_indices_mask, relative_losses, -float('inf'))
+
+            # get the hardest example of this step based on relative loss
+            max_index = torch.argmax(relative_losses).view(1)
+            candidate_losses.append(relative_losses.index_select(0, max_index))
+            candidate_indicies.append(info['function_indicies'].index_select(0, max_index))
+    finally:
+        torch.backends.cuda.matmul.allow_tf32 = previous_allow_tf32
+
+    # get the hardest example overall. This is the only sync with the device
+    candidate_losses = torch.cat(candidate_losses)
+    hardest_step = torch.argmax(candidate_losses).item()
+    max_relative_loss = candidate_losses[hardest_step].item()
+    if max_relative_loss == -float('inf'):
         raise RuntimeError("No valid examples found in the last 50 samples. Please check the dataset indices.")
+    hardest_index = candidate_indicies[hardest_step].item()
 
-    print(f"\nHardest example function index (for DeepONet): {hardest_info['function_indicies'].item()}")
+    print(f"\nHardest example function index (for DeepONet): {hardest_index}")
     print(f"Maximum relative loss value (DeepONet): {(max_relative_loss * 100):.4f}%")
 
     # Get ground truth displacements
-    hardest_index = hardest_info['function_indicies'].item()
     info_hardest = {'function_indicies': torch.tensor([hardest_index], device=device)}
     info_offset1 = {'function_indicies': torch.tensor([hardest_index - 50], device=device)}
     info_offset2 = {'function_indicies': torch.tensor([hardest_index - 100], device=device)}
@@ -312,28 +333,21 @@ with torch.no_grad():
     example_ys_offset1 = testing_combined_dataset.src_dataset.compute_outputs(info_offset1, example_xs_offset1)
     example_ys_offset2 = testing_combined_dataset.src_dataset.compute_outputs(info_offset2, example_xs_offset2)
 
-    rep_hardest, _ = b2b_model["src"].compute_representation(example_xs_hardest, example_ys_hardest, method=args.train_method)
-    rep_offset1, _ = b2b_model["src"].compute_representation(example_xs_offset1, example_ys_offset1, method=args.train_method)
-    rep_offset2, _ = b2b_model["src"].compute_representation(example_xs_offset2, example_ys_offset2, method=args.train_method)
-
-    rep_hardest = b2b_model["A"](rep_hardest)
-    rep_offset1 = b2b_model["A"](rep_offset1)
-    rep_offset2 = b2b_model["A"](rep_offset2)
+    # compute all three representations in one batched least squares solve, each function is solved independently
+    example_xs_all = torch.cat([example_xs_hardest, example_xs_offset1, example_xs_offset2])
+    example_ys_all = torch.cat([example_ys_hardest, example_ys_offset1, example_ys_offset2])
+    reps, _ = b2b_model["src"].compute_representation(example_xs_all, example_ys_all, method=args.train_method)
+    reps = b2b_model["A"](reps)
 
-    b2b_y_hardest = b2b_model["tgt"].predict(xs_hardest, rep_hardest)
-    b2b_y_offset1 = b2b_model["tgt"].predict(xs_offset1, rep_offset1)
-    b2b_y_offset2 = b2b_model["tgt"].predict(xs_offset2, rep_offset2)
+    # the target inputs of the three functions have the same shape, so predict them in one pass as well
+    xs_all = torch.cat([xs_hardest, xs_offset1, xs_offset2])
+    b2b_y_hardest, b2b_y_offset1, b2b_y_offset2 = b2b_model["tgt"].predict(xs_all, reps).split(1)
 
     # Get DeepONet predictions
     deeponet_y_hardest = deeponet_model.forward(example_xs_hardest, example_ys_hardest, xs_hardest)
     deeponet_y_offset1 = deeponet_model.forward(example_xs_offset1, example_ys_offset1, xs_offset1)
     deeponet_y_offset2 = deeponet_model.forward(example_xs_offset2, example_ys_offset2, xs_offset2)
 
-    # Add after getting the ground truth outputs
-    def denormalize(y):
-        mean, std = (2.8366714104777202e-05, 4.263603113940917e-05)
-        return y * std + mean
-
     # Denormalize before checking linearity
     ys_hardest_denorm = denormalize(ys_hardest)
     ys_offset1_denorm = denormalize(ys_offset1)
@@ -341,7 +355,7 @@ with torch.no_grad():
 
     # Compare ground truth linearity with denormalized values
     gt_sum = ys_offset1_denorm + ys_offset2_denorm
-    gt_diff = torch.abs(ys_hardest_denorm - gt_sum)
+    gt_diff = (ys_hardest_denorm - gt_sum).abs_()
     print(f"\nGround Truth Linearity Check (Denormalized):")
     print(f"Max difference: {torch.max(gt_diff):.6e}")
     print(f"Mean difference: {torch.mean(gt_diff):.6e}")
@@ -351,7 +365,7 @@ with torch.no_grad():
     b2b_y_offset1_denorm = denormalize(b2b_y_offset1)
     b2b_y_offset2_denorm = denormalize(b2b_y_offset2)
     b2b_sum = 10*b2b_y_offset1_denorm + 15*b2b_y_offset2_denorm
-    b2b_diff = torch.abs(b2b_y_hardest_denorm - b2b_sum)
+    b2b_diff = (b2b_y_hardest_denorm - b2b_sum).abs_()
     print(f"\nMatrix Model Linearity Check (Denormalized):")
     print(f"Max difference: {torch.max(b2b_diff):.6e}")
     print(f"Mean difference: {torch.mean(b2b_diff):.6e}")
@@ -361,30 +375,16 @@ with torch.no_grad():
     deeponet_y_offset1_denorm = denormalize(deeponet_y_offset1)
     deeponet_y_offset2_denorm = denormalize(deeponet_y_offset2)
     deeponet_sum = 10*deeponet_y_offset1_denorm + 15*deeponet_y_offset2_denorm
-    deeponet_diff = torch.abs(deeponet_y_hardest_denorm - deeponet_sum)
+    deeponet_diff = (deeponet_y_hardest_denorm - deeponet_sum).abs_()
     print(f"\nDeepONet Linearity Check (Denormalized):")
     print(f"Max difference: {torch.max(deeponet_diff):.6e}")
     print(f"Mean difference: {torch.mean(deeponet_diff):.6e}")
 
-    # use hardest data
-    example_xs, example_ys, xs, ys, info = hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info
-
-    # Add offset variable
-    _diff1 = 100
-    _diff2 = 50
-    # Get new data for offset index
-    new_index1 = hardest_info['function_indicies'].item() - _diff1
-    new_index2 = hardest_info['function_indicies'].item() - _diff2
-    info1 = {'function_indicies': torch.tensor([new_index1], device=device)}
-    info2 = {'function_indicies': torch.tensor([new_index2], device=device)}
-    example_xs1 = testing_combined_dataset.src_dataset.sample_inputs(info1, None)
-    example_ys1 = testing_combined_dataset.src_dataset.compute_outputs(info1, example_xs1)
-    example_xs2 = testing_combined_dataset.src_dataset.sample_inputs(info2, None)
-    example_ys2 = testing_combined_dataset.src_dataset.compute_outputs(info2, example_xs2)
-    xs1 = testing_combined_dataset.tgt_dataset.sample_inputs(info1, None)
-    xs2 = testing_combined_dataset.tgt_dataset.sample_inputs(info2, None)
-    ys1 = testing_combined_dataset.tgt_dataset.compute_outputs(info1, xs1)
-    ys2 = testing_combined_dataset.tgt_dataset.compute_outputs(info2, xs2)
+    # Get data for the offset indices. Index 1 is 100 below the hardest and index 2 is 50 below,
+    # which are the offset2 and offset1 functions sampled above, so reuse them
+    info1, info2 = info_offset2, info_offset1
+    example_xs1, example_ys1, xs1, ys1 = example_xs_offset2, example_ys_offset2, xs_offset2, ys_offset2
+    example_xs2, example_ys2, xs2, ys2 = example_xs_offset1, example_ys_offset1, xs_offset1, ys_offset1
 
     # Use xs1, for plotting since we're only showing one example
     xs = xs1
@@ -406,18 +406,17 @@ with torch.no_grad():
     b2b_example_y_hats = None
     deeponet_example_y_hats = None
 
-    dict_b2b = copy.deepcopy(info1)
-    dict_b2b["model_type"] = "matrix_least_squares"
-    dict_deeponet = copy.deepcopy(info1)
-    dict_deeponet["model_type"] = "deeponet"
+    # plot_transformation only reads these, so shallow copies are enough
+    dict_b2b = {**info1, "model_type": "matrix_least_squares"}
+    dict_deeponet = {**info1, "model_type": "deeponet"}
     
     plot_transformation(grid, grid_outs, b2b_example_y_hats, xs, b2b_y_hardest_denorm, b2b_sum, dict_b2b, args.load_path_matrix)
     plot_transformation(grid, grid_outs, deeponet_example_y_hats, xs, deeponet_y_hardest_denorm, deeponet_sum, dict_deeponet, args.load_path_deeponet)
 
     # Calculate and print average relative losses for the hardest sample
     max_displacement = ys_hardest_denorm.abs().max()
-    b2b_relative_loss = torch.mean(torch.abs(b2b_y_hardest_denorm - ys_hardest_denorm)) / max_displacement
-    deeponet_relative_loss = torch.mean(torch.abs(deeponet_y_hardest_denorm - ys_hardest_denorm)) / max_displacement
+    b2b_relative_loss = (b2b_y_hardest_denorm - ys_hardest_denorm).abs_().mean() / max_displacement
+    deeponet_relative_loss = (deeponet_y_hardest_denorm - ys_hardest_denorm).abs_().mean() / max_displacement
     
     print(f"\nRelative Losses (MAE) for hardest sample:")
     print(f"B2B Relative Loss: {(b2b_relative_loss * 100):.4f}%")
@@ -1,9 +1,6 @@
-from datetime import datetime
-
 import matplotlib.pyplot as plt
 import torch
 import matplotlib
-import copy
 
 from FunctionEncoder import TensorboardCallback, FunctionEncoder
 
@@ -16,8 +13,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.DarcyDataset import DarcySrcDataset, DarcyTgtDataset, plot_source_darcy, plot_target_darcy, plot_transformation_darcy
-from src.Datasets.HeatDataset import HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
-from src.Datasets.L_shapedDataset import LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
+from src.Datasets.HeatDataset import load_heat_mat, HeatSrcDataset, HeatTgtDataset, plot_source_heat, plot_target_heat, plot_transformation_heat
+from src.Datasets.L_shapedDataset import load_L_mat, LSrcDataset, LTgtDataset, plot_source_L, plot_target_L, plot_transformation_L
 from src.DeepONet import DeepONet
 from src.DeepONet_CNN import DeepONet_CNN, DeepONet_2Stage_CNN_branch
 from src.MatrixMethodHelpers import compute_A, train_nonlinear_transformation, get_num_parameters, get_num_layers, predict_number_params, get_hidden_layer_size, check_parameters
@@ -29,7 +26,7 @@ from src.Datasets.QuadraticSinDataset import QuadraticDataset, SinDataset, plot_
 from src.Datasets.DerivativeDataset import CubicDerivativeDataset, CubicDataset, plot_source_cubic, plot_target_cubic_derivative, plot_transformation_derivative
 from src.Datasets.IntegralDataset import QuadraticIntegralDataset, plot_target_quadratic_integral, plot_transformation_integral
 from src.Datasets.MountainCarPoliciesDataset import MountainCarPoliciesDataset, MountainCarEpisodesDataset, plot_source_mountain_car, plot_target_mountain_car, plot_transformation_mountain_car
-from src.Datasets.ElasticPlateDataset import ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
+from src.Datasets.ElasticPlateDataset import load_elastic_mat, ElasticPlateBoudaryForceDataset, ElasticPlateDisplacementDataset,plot_target_boundary, plot_source_boundary_force, plot_transformation_elastic
 from src.Datasets.OperatorDataset import CombinedDataset
 
 
@@ -57,17 +54,20 @@ def get_dataset(dataset_type:str, test:bool, model_type:str, n_sensors:int, devi
         src_dataset = MountainCarPoliciesDataset(freeze_example_xs=freeze_example_xs, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = MountainCarEpisodesDataset(n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Elastic":
-        src_dataset = ElasticPlateBoudaryForceDataset(freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = ElasticPlateDisplacementDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_elastic_mat(test) # parsed once for both datasets
+        src_dataset = ElasticPlateBoudaryForceDataset(mat=mat, freeze_example_xs=freeze_example_xs, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = ElasticPlateDisplacementDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Darcy":
         src_dataset = DarcySrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
         tgt_dataset = DarcyTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "Heat":
-        src_dataset = HeatSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = HeatTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_heat_mat(test) # parsed once for both datasets
+        src_dataset = HeatSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = HeatTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     elif dataset_type == "LShaped":
-        src_dataset = LSrcDataset(test=test, n_examples_per_sample=n_sensors, device=device)
-        tgt_dataset = LTgtDataset(test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
+        mat = load_L_mat(test) # parsed once for both datasets
+        src_dataset = LSrcDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, device=device)
+        tgt_dataset = LTgtDataset(mat=mat, test=test, n_examples_per_sample=n_sensors, freeze_xs=freeze_xs, device=device)
     else:
         raise ValueError(f"Unknown dataset type: {dataset_type}")
     combined_dataset = CombinedDataset(src_dataset, tgt_dataset, calibration_only=(model_type == "matrix"))
@@ -119,13 +119,14 @@ logdir = f"{args.logdir}/{dataset_type}"
 # next, get all subdirs for both deeponet and b2b (matrix)
 deeponet_dir = f"{logdir}/deeponet"
 b2b_dir = f"{logdir}/matrix_least_squares"
-deeponet_subdirs = [f"{deeponet_dir}/{subdir}" for subdir in os.listdir(deeponet_dir) if os.path.isdir(f"{deeponet_dir}/{subdir}")]
-b2b_subdirs = [f"{b2b_dir}/{subdir}" for subdir in os.listdir(b2b_dir) if os.path.isdir(f"{b2b_dir}/{subdir}")]
+deeponet_subdirs = [f.path for f in os.scandir(deeponet_dir) if f.is_dir()]
+b2b_subdirs = [f.path for f in os.scandir(b2b_dir) if f.is_dir()]
 
 
 # next, get the oldest subdir by when it was created
-deeponet_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
-b2b_subdirs.sort(key=lambda x: datetime.strptime(x.split("/")[-1], "%Y-%m-%d_%H-%M-%S"))
+# subdirs are named %Y-%m-%d_%H-%M-%S, which sorts chronologically as a plain string
+deeponet_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
+b2b_subdirs.sort(key=lambda x: x.rsplit("/", 1)[-1])
 deeponet_subdir = deeponet_subdirs[args.seed-1]
 b2b_subdir = b2b_subdirs[args.seed-1]
 
@@ -183,10 +184,9 @@ b2b_model = {"src": src_model, "tgt": tgt_model}
 # optionally add neural network to transform between spaces for nonlinear operator
 if transformation_type == "nonlinear":
     transformation_input_size = src_model.n_basis if src_model is not None else src_dataset.output_size[0]
-    layers = [torch.nn.Linear(transformation_input_size, hidden_size),torch.nn.ReLU()]
-    for layer in range(n_layers - 2):
-        layers += [torch.nn.Linear(hidden_size, hidden_size), torch.nn.ReLU()]
-    layers += [torch.nn.Linear(hidden_size, tgt_model.n_basis)]
+    layers = [torch.nn.Linear(transformation_input_size, hidden_size), torch.nn.ReLU(),
+              *(layer for _ in range(n_layers - 2) for layer in (torch.nn.Linear(hidden_size, hidden_size), torch.nn.ReLU())),
+              torch.nn.Linear(hidden_size, tgt_model.n_basis)]
     a_model = torch.nn.Sequential(*layers).to(device)
     b2b_model["A"] = a_model
 else:
@@ -224,53 +224,82 @@ assert n_params == predict_n_params, f"Number of parameters is not consistent, e
 
 # load models
 if b2b_model["src"] is not None:
-    b2b_model["src"].load_state_dict(torch.load(f"{args.load_path_matrix}/src_model.pth", weights_only=True, map_location=device))
-b2b_model["tgt"].load_state_dict(torch.load(f"{args.load_path_matrix}/tgt_model.pth", weights_only=True, map_location=device))
+    b2b_model["src"].load_state_dict(torch.load(f"{args.load_path_matrix}/src_model.pth", weights_only=True, map_location=device, mmap=True))
+b2b_model["tgt"].load_state_dict(torch.load(f"{args.load_path_matrix}/tgt_model.pth", weights_only=True, map_location=device, mmap=True))
 if transformation_type == "linear":
-    b2b_model["A"] = torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device)
+    b2b_model["A"] = torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device, mmap=True)
 else:
-    b2b_model["A"].load_state_dict(torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device))
+    b2b_model["A"].load_state_dict(torch.load(f"{args.load_path_matrix}/A.pth", weights_only=True, map_location=device, mmap=True))
+
+deeponet_model.load_state_dict(torch.load(f"{args.load_path_deeponet}/model.pth", weights_only=True, map_location=device, mmap=True))
+
 
-deeponet_model.load_state_dict(torch.load(f"{args.load_path_deeponet}/model.pth", weights_only=True, map_location=device))
 
+# maps example data to target predictions, source encoder -> A -> target decoder
+def forward_b2b(example_xs, example_ys, xs):
+    if type(combined_dataset.src_dataset) == HeatSrcDataset:
+        rep = example_ys[:, 0, :]
+    else:
+        rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
+
+    if transformation_type == "linear":
+        rep = rep @ b2b_model["A"].T
+    else:
+        rep = b2b_model["A"](rep)
+    return b2b_model["tgt"].predict(xs, rep)
+
+# the search calls the pipeline many times with the same shapes, so compile it.
+# Outputs of the compiled function may be overwritten by the next call, so clone anything that is kept.
+compiled_forward_b2b = torch.compile(forward_b2b, mode="reduce-overhead", dynamic=False)
 
 
 ##############   Evaluate    ###################
-with torch.no_grad():
+with torch.inference_mode():
     
-    hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info = None, None, None, None, None
-    b2b_loss = -1000000
-    hardest_index = -1  # Add this to track the index
+    # the hardest function of every step, kept on the device so the loop never waits on a device->host copy
+    candidate_losses, candidates = [], []
     
-    for search_step in trange(1000):
-        # plot transformation for all model types
-        example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample(device, plot_only=False)
+    # search 1000 batches, evaluating several at once so each forward pass is larger.
+    # TF32 matmuls are accurate enough to rank functions by loss. The plotted predictions below are computed in full fp32
+    # the previous setting is restored afterwards, also if the search raises
+    previous_allow_tf32 = torch.backends.cuda.matmul.allow_tf32
+    torch.backends.cuda.matmul.allow_tf32 = True
+    try:
+        n_draws_per_step = 10
+        for search_step in trange(1000 // n_draws_per_step):
+            # plot transformation for all model types
+            example_xs, example_ys, xs, ys, info = testing_combined_dataset.sample_batch(n_draws_per_step, device)
         
-        # get output space predictions
-        if type(combined_dataset.src_dataset) == HeatSrcDataset:
-            rep = example_ys[:, 0, :]
-        else:
-            rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
-
-        if transformation_type == "linear":
-            rep = rep @ b2b_model["A"].T
-        else:
-            rep = b2b_model["A"](rep)
-        b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
-
-        # compute the loss for each function
-        losses = ((b2b_y_hats - ys)**2).mean(dim=(1,2))
-
-        # get the hardest example
-        max_index = torch.argmax(losses)
-        if losses[max_index] > b2b_loss:
-            hardest_example_xs = example_xs[max_index:max_index+1]
-            hardest_example_ys = example_ys[max_index:max_index+1]
-            hardest_xs = xs[max_index:max_index+1]
-            hardest_ys = ys[max_index:max_index+1]
-            hardest_info = {key: value[max_index:max_index+1] for key, value in info.items()}
-            b2b_loss = losses[max_index]
-            hardest_index = search_step  # Store the search step where we found the hardest example
+            # get output space predictions
+            try:
+                b2b_y_hats = compiled_forward_b2b(example_xs, example_ys, xs)
+            except (torch._dynamo.exc.BackendCompilerFailed, RuntimeError) as e: # compilation is not supported everywhere, e.g. without a c++ compiler
+                if compiled_forward_b2b is forward_b2b:
+                    raise
+                # a genuine error in the model is not a compile failure, it fails again in eager mode and is raised from there
+                print("torch.compile failed, falling back to eager mode:", e)
+                compiled_forward_b2b = forward_b2b
+                b2b_y_hats = compiled_forward_b2b(example_xs, example_ys, xs)
+
+            # compute the loss for each function
+            losses = ((b2b_y_hats - ys)**2).mean(dim=(1,2))
+
+            # get the hardest example of this step. index_select keeps the function dimension
+            max_index = torch.argmax(losses).view(1)
+            candidate_losses.append(losses.index_select(0, max_index))
+            candidates.append((example_xs.index_select(0, max_index),
+                               example_ys.index_select(0, max_index),
+                               xs.index_select(0, max_index),
+                               ys.index_select(0, max_index),
+                               {key: value.index_select(0, max_index) for key, value in info.items()}))
+    finally:
+        torch.backends.cuda.matmul.allow_tf32 = previous_allow_tf32
+
+    # get the hardest example overall. This is the only sync with the device
+    candidate_losses = torch.cat(candidate_losses)
+    hardest_step = torch.argmax(candidate_losses).item()
+    b2b_loss = candidate_losses[hardest_step].item()
+    hardest_example_xs, hardest_example_ys, hardest_xs, hardest_ys, hardest_info = candidates[hardest_step]
 
     print(f"\nHardest example function index: {hardest_info['function_indicies'].item()}")  # Print the actual function index
     print(f"Maximum loss value: {b2b_loss:.6f}")
@@ -317,24 +346,13 @@ with torch.no_grad():
         b2b_example_y_hats = None
     deeponet_example_y_hats = None
 
-    # next compute y_hats for all models
-    if type(combined_dataset.src_dataset) == HeatSrcDataset:
-        rep = example_ys[:, 0, :]
-    else:
-        rep, _ = b2b_model["src"].compute_representation(example_xs, example_ys, method=args.train_method)
-
-
-    if transformation_type == "linear":
-        rep = rep @ b2b_model["A"].T
-    else:
-        rep = b2b_model["A"](rep)
-    b2b_y_hats = b2b_model["tgt"].predict(xs, rep)
+    # next compute y_hats for all models. This is a single function, so the eager pipeline is used
+    b2b_y_hats = forward_b2b(example_xs, example_ys, xs)
     deeponet_y_hats = deeponet_model.forward(example_xs, example_ys, xs)
 
-    dict_b2b = copy.deepcopy(info)
-    dict_b2b["model_type"] = "matrix_least_squares"
-    dict_deeponet = copy.deepcopy(info)
-    dict_deeponet["model_type"] = "deeponet"
+    # the plots only read info, so a shallow copy is enough
+    dict_b2b = {**info, "model_type": "matrix_least_squares"}
+    dict_deeponet = {**info, "model_type": "deeponet"}
     plot_transformation(grid, grid_outs, b2b_example_y_hats, xs, ys, b2b_y_hats, dict_b2b, args.load_path_matrix)
     plot_transformation(grid, grid_outs, deeponet_example_y_hats, xs, ys, deeponet_y_hats,dict_deeponet, args.load_path_deeponet)
 
@@ -1,5 +1,9 @@
+import matplotlib
+matplotlib.use("Agg") # only saves figures, so skip loading a GUI backend
 import matplotlib.pyplot as plt
 import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from tensorboard.backend.event_processing import event_accumulator
 
@@ -8,133 +12,179 @@ def read_tensorboard(logdir, scalars):
     """returns a dictionary of numpy arrays for each requested scalar"""
     ea = event_accumulator.EventAccumulator(
         logdir,
-        size_guidance={event_accumulator.SCALARS: 0},
+        # keep every scalar, but only a single entry of everything else so Reload() skips it
+        size_guidance={event_accumulator.SCALARS: 0,
+                       event_accumulator.IMAGES: 1,
+                       event_accumulator.HISTOGRAMS: 1,
+                       event_accumulator.COMPRESSED_HISTOGRAMS: 1,
+                       event_accumulator.AUDIO: 1,
+                       event_accumulator.TENSORS: 1},
     )
     _absorb_print = ea.Reload()
     # make sure the scalars are in the event accumulator tags
+    tags = set(ea.Tags()["scalars"])
     for s in scalars:
-        assert s in ea.Tags()["scalars"], f"{s} not found in event accumulator"
-    data = {k: np.array([[e.step, e.value] for e in ea.Scalars(k)]) for k in scalars}
-    return data
-
-datasts = ["Integral", "Derivative", "Elastic", "Darcy", "Heat", "LShaped"]
-algs = ["SVD_least_squares", "matrix_least_squares", "Eigen_least_squares","deeponet", "deeponet_cnn", "deeponet_pod", "deeponet_2stage", "deeponet_2stage_cnn"]
-logdir = "logs_experiment"
-
-# for every dataset type
-table = {}
-for dataset in datasts:
-    print(dataset)
-    log_dataset_dir = os.path.join(logdir, dataset)
+        assert s in tags, f"{s} not found in event accumulator"
     data = {}
+    for k in scalars:
+        events = ea.Scalars(k)
+        # float64 so large step counts stay exact, float32 only holds integers up to 2**24
+        data[k] = np.array([(e.step, e.value) for e in events], dtype=np.float64).reshape(-1, 2)
+    return data
 
-    # create plots for each dataset, just to visualize
-    fig, ax = plt.subplots()
-
-
-    # for every algorithm
+def quartiles(raw_data):
+    """returns the 25th, 50th and 75th percentiles along axis 0, interpolated the same way as np.quantile.
+    Only the order statistics around each quartile are needed, so a partition is used instead of a full sort"""
+    pos = np.array([0.25, 0.5, 0.75]) * (raw_data.shape[0] - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.ceil(pos).astype(int)
+    part = np.partition(raw_data, np.union1d(lo, hi), axis=0)
+    frac = (pos - lo)[:, None]
+    return (part[lo] + frac * (part[hi] - part[lo])).astype(raw_data.dtype)
+
+def _read_seed(subdir):
+    """reads the test mse of one seed trial. Module level so it can be sent to worker processes"""
+    # event files do not change once a run is done, so reuse the parsed values if they are newer than every event file
+    cache = os.path.join(subdir, ".mse.npz")
+    event_files = glob.glob(os.path.join(subdir, "events.out.tfevents.*"))
+    if os.path.exists(cache) and event_files and os.path.getmtime(cache) > max(os.path.getmtime(f) for f in event_files):
+        z = np.load(cache)
+        return np.stack([z["steps"], z["values"]], axis=1)
+    mse = read_tensorboard(subdir, ["test/mse"])["test/mse"]
+    np.savez(cache, steps=mse[:, 0], values=mse[:, 1])
+    return mse
+
+if __name__ == "__main__":
+    datasts = ["Integral", "Derivative", "Elastic", "Darcy", "Heat", "LShaped"]
+    algs = ["SVD_least_squares", "matrix_least_squares", "Eigen_least_squares","deeponet", "deeponet_cnn", "deeponet_pod", "deeponet_2stage", "deeponet_2stage_cnn"]
+    logdir = "logs_experiment"
+
+    # parsing event files is CPU bound, so seeds are read in separate processes
+    # the with block shuts the pool down even if a dataset raises
+    with ProcessPoolExecutor() as executor:
+        # for every dataset type
+        table = {}
+        for dataset in datasts:
+            print(dataset)
+            log_dataset_dir = os.path.join(logdir, dataset)
+            data = {}
+            ok_algs = [] # algs whose logs were fully read
+
+            # create plots for each dataset, just to visualize
+            fig, ax = plt.subplots()
+
+
+            # for every algorithm
+            for alg in algs:
+                try:
+                    print("\t", alg)
+                    log_alg_dir = os.path.join(log_dataset_dir, alg)
+
+                    # if the log alg dir doesnt exist, the alg isnt applicable to this dataset
+                    # so just continue
+                    if not os.path.exists(log_alg_dir):
+                        print("\t\tN/A")
+                        continue
+
+                    # list all subdirectories. Each is a seed trial run. Sorted so the seed order is reproducible
+                    subdirs = sorted(f.path for f in os.scandir(log_alg_dir) if f.is_dir(follow_symlinks=False))
+                    if len(subdirs) == 0:
+                        print("\t\tNo trials")
+                        continue
+
+                    # read the tensorboard data of every seed in parallel
+                    for subdir in subdirs:
+                        print("\t\t", subdir)
+                    results = list(executor.map(_read_seed, subdirs))
+
+                    # write each trial into its row of raw_data. All trials share the steps of the first one
+                    raw_data = np.empty((len(results), results[0].shape[0]), dtype=np.float32)
+                    for j, d in enumerate(results):
+                        raw_data[j] = d[:, 1]
+                    alg_data = {"steps": results[0][:, 0]}
+
+                    # compute median and quartiles
+                    quarts = quartiles(raw_data)
+                    alg_data["median"] = quarts[1]
+                    alg_data["q1"] = quarts[0]
+                    alg_data["q3"] = quarts[2]
+                    alg_data["mean_final_value"] = np.mean(raw_data[:, -1])
+                    alg_data["std_final_value"] = np.std(raw_data[:, -1])
+
+                    # only record the alg once everything has been read, so later steps never see partial data
+                    data[alg] = alg_data
+                    ok_algs.append(alg)
+
+
+                    # plot with fill between
+                    ax.plot(data[alg]["steps"], data[alg]["median"], label=alg)
+                    ax.fill_between(data[alg]["steps"], data[alg]["q1"], data[alg]["q3"], alpha=0.3)
+                except (FileNotFoundError, AssertionError, KeyError, ValueError) as e: # ValueError: seeds of different lengths
+                    print(e)
+                    continue
+            miny = 0
+            maxy = max(data["deeponet"]["q3"][15], data["matrix_least_squares"]["q3"][15])
+            ax.set_ylim(miny, maxy)
+            plt.title(dataset)
+            ax.legend()
+            plt.savefig(os.path.join(log_dataset_dir, "plot.png"))
+            plt.close(fig)
+
+            # also save to csv for plotting in latex later.
+            # create headers
+            col_headers = ["step"]
+            for alg in algs:
+                col_headers.append(f"{alg}_median")
+                col_headers.append(f"{alg}_q1")
+                col_headers.append(f"{alg}_q3")
+
+            # fetch data. The step column is filled in when saving, so the steps are not rounded to float32
+            steps = data["matrix_least_squares"]["steps"]
+            data_matrix = np.zeros((len(steps), 3*len(algs)+1), dtype=np.float32)
+            for i, alg in enumerate(algs):
+                # skip missing algs, and algs logged at different steps than the step column
+                if alg not in ok_algs or len(data[alg]["median"]) != data_matrix.shape[0]:
+                    continue
+                data_matrix[:, 3*i+1] = data[alg]["median"]
+                data_matrix[:, 3*i+2] = data[alg]["q1"]
+                data_matrix[:, 3*i+3] = data[alg]["q3"]
+
+            # save to csv, steps as integers and the values with 6 significant digits
+            np.savetxt(os.path.join(log_dataset_dir, "plot.csv"), np.column_stack([steps, data_matrix[:, 1:]]),
+                       fmt=["%d"] + ["%.6g"] * (data_matrix.shape[1] - 1), delimiter=",", header=",".join(col_headers), comments="")
+
+            # add mean and std to table
+            table[dataset] = {}
+            for alg in ok_algs:
+                table[dataset][alg] = (data[alg]["mean_final_value"], data[alg]["std_final_value"])
+
+    # print the mean and std of the final values for all datasts for each alg
+    # $1.31\mathrm{e}{0} \pm 1.04\mathrm{e}{0}$
+    # do this in latex format so i can copy paste into document
+    print("The printed order is different than the order in the PDF.")
+    print("ORDER: ")
     for alg in algs:
-        try:
-            print("\t", alg)
-            log_alg_dir = os.path.join(log_dataset_dir, alg)
-
-            # if the log alg dir doesnt exist, the alg isnt applicable to this dataset
-            # so just continue
-            if not os.path.exists(log_alg_dir):
-                print("\t\tN/A")
+        if "cnn" in alg:
                 continue
+        print(f"{alg}, ", end="")
 
-            data[alg] = {"raw_data_values": [], "raw_data_steps": []}
-            # list all subdirectories. Each is a seed trial run
-            subdirs = [f.path for f in os.scandir(log_alg_dir) if f.is_dir()]
-
-            # iterate subdirs and add to list
-            for subdir in subdirs:
-                print("\t\t", subdir)
-
-                # read the tensorboard data
-                d = read_tensorboard(subdir, ["test/mse"])
-                data[alg]["raw_data_steps"].append(d["test/mse"][:, 0])
-                data[alg]["raw_data_values"].append(d["test/mse"][:, 1])
-            
-            # compute median and quartiles
-            raw_data = np.stack(data[alg]["raw_data_values"], axis=0)
-            quarts = np.percentile(raw_data, [25, 50, 75], axis=0)
-            data[alg]["median"] = quarts[1]
-            data[alg]["q1"] = quarts[0]
-            data[alg]["q3"] = quarts[2]
-            data[alg]["mean_final_value"] = np.mean(raw_data[:, -1])
-            data[alg]["std_final_value"] = np.std(raw_data[:, -1])
-
-
-            # plot with fill between
-            ax.plot(data[alg]["raw_data_steps"][0], data[alg]["median"], label=alg)
-            ax.fill_between(data[alg]["raw_data_steps"][0], data[alg]["q1"], data[alg]["q3"], alpha=0.3)
-        except Exception as e:
-            print(e)
-            continue
-    miny = 0
-    maxy = max(data["deeponet"]["q3"][15], data["matrix_least_squares"]["q3"][15])
-    ax.set_ylim(miny, maxy)
-    plt.title(dataset)
-    ax.legend()
-    plt.savefig(os.path.join(log_dataset_dir, "plot.png"))
-
-    # also save to csv for plotting in latex later.
-    # create headers
-    col_headers = ["step"]
-    for alg in algs:
-        col_headers.append(f"{alg}_median")
-        col_headers.append(f"{alg}_q1")
-        col_headers.append(f"{alg}_q3")
-
-    # fetch data
-    data_matrix = np.zeros((len(data["matrix_least_squares"]["raw_data_steps"][0]), 3*len(algs)+1))
-    data_matrix[:, 0] = data["matrix_least_squares"]["raw_data_steps"][0]
-    for i, alg in enumerate(algs):
-        try:
-            data_matrix[:, 3*i+1] = data[alg]["median"]
-            data_matrix[:, 3*i+2] = data[alg]["q1"]
-            data_matrix[:, 3*i+3] = data[alg]["q3"]
-        except:
-            continue
-
-    # save to csv
-    np.savetxt(os.path.join(log_dataset_dir, "plot.csv"), data_matrix, delimiter=",", header=",".join(col_headers), comments="")
-
-    # add mean and std to table
-    table[dataset] = {}
-    for alg in algs:
-        if alg in data:
-            table[dataset][alg] = (data[alg]["mean_final_value"], data[alg]["std_final_value"])
-
-# print the mean and std of the final values for all datasts for each alg
-# $1.31\mathrm{e}{0} \pm 1.04\mathrm{e}{0}$
-# do this in latex format so i can copy paste into document
-print("The printed order is different than the order in the PDF.")
-print("ORDER: ")
-for alg in algs:
-    if "cnn" in alg:
-            continue
-    print(f"{alg}, ", end="")
-
-for d in datasts:
-    print("\n")
-    print(d, end="")
-    print(" & ", end="")
-    for alg in algs:
-        # skip these
-        if "cnn" in alg:
-            continue
+    for d in datasts:
+        print("\n")
+        print(d, end="")
+        print(" & ", end="")
+        for alg in algs:
+            # skip these
+            if "cnn" in alg:
+                continue
 
 
-        try:
-            # get the two parts of the scientific notation
-            mean, std = table[d][alg]
-            mean_str = f"{mean:0.2E}".split("E")
-            std_str = f"{std:0.2E}".split("E")
-            print(f"${mean_str[0]}\\mathrm{{e}}{{{mean_str[1]}}} \\pm {std_str[0]}\\mathrm{{e}}{{{std_str[1]}}}$", end="")
-        except:
-            print(" - ", end="")
-        print(" & ", end="")
-print()
\ No newline at end of file
+            try:
+                # get the two parts of the scientific notation
+                mean, std = table[d][alg]
+                mean_str = f"{mean:0.2E}".split("E")
+                std_str = f"{std:0.2E}".split("E")
+                print(f"${mean_str[0]}\\mathrm{{e}}{{{mean_str[1]}}} \\pm {std_str[0]}\\mathrm{{e}}{{{std_str[1]}}}$", end="")
+            except:
+                print(" - ", end="")
+            print(" & ", end="")
+    print()
\ No newline at end of file
@@ -1,6 +1,6 @@
 import numpy as np
-import scipy.io
 import matplotlib.pyplot as plt
+import scipy.io
 import torch
 from scipy.interpolate import griddata
 import matplotlib.ticker as ticker
@@ -9,6 +9,12 @@ from plotting_specs import colors, labels, titles
 
 from src.Datasets.OperatorDataset import OperatorDataset
 
+
+# parses the train or test .mat file of this dataset
+def load_elastic_mat(test:bool) -> dict:
+    return scipy.io.loadmat(f"./src/Datasets/Elastic/linearElasticity_{'test' if test else 'train'}.mat")
+
+
 plt.rcParams.update({'font.size': 12})
 plt.rc('text', usetex=True)
 plt.rcParams["font.family"] = "Times New Roman"
@@ -47,13 +53,13 @@ plt.rcParams["font.family"] = "Times New Roman"
 
 
 class ElasticPlateBoudaryForceDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_elastic_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_test.mat')
             tag = "f_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_train.mat')
             tag = "f_train"
         # boundary force outputs
         f_bc = mat[tag]
@@ -103,13 +109,13 @@ class ElasticPlateBoudaryForceDataset(OperatorDataset):
 
 
 class ElasticPlateDisplacementDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_elastic_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_test.mat')
             tags = "ux_test", "uy_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_train.mat')
             tags = "ux_train", "uy_train"
 
         # output data
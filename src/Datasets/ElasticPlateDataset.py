@@ -1,14 +1,21 @@
 import numpy as np
-import scipy.io
 import matplotlib.pyplot as plt
+import scipy.io
 import torch
-from scipy.interpolate import griddata
+from scipy.interpolate import griddata, CloughTocher2DInterpolator
+from scipy.spatial import Delaunay
 import matplotlib.ticker as ticker
 from plotting_specs import colors, labels, titles
 
 
 from src.Datasets.OperatorDataset import OperatorDataset
 
+
+# parses the train or test .mat file of this dataset
+def load_elastic_mat(test:bool) -> dict:
+    return scipy.io.loadmat(f"./src/Datasets/Elastic/linearElasticity_{'test' if test else 'train'}.mat")
+
+
 plt.rcParams.update({'font.size': 12})
 plt.rc('text', usetex=True)
 plt.rcParams["font.family"] = "Times New Roman"
@@ -47,13 +54,13 @@ plt.rcParams["font.family"] = "Times New Roman"
 
 
 class ElasticPlateBoudaryForceDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_elastic_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_test.mat')
             tag = "f_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_train.mat')
             tag = "f_train"
         # boundary force outputs
         f_bc = mat[tag]
@@ -103,13 +110,13 @@ class ElasticPlateBoudaryForceDataset(OperatorDataset):
 
 
 class ElasticPlateDisplacementDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_elastic_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_test.mat')
             tags = "ux_test", "uy_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Elastic/linearElasticity_train.mat')
             tags = "ux_train", "uy_train"
 
         # output data
@@ -324,10 +331,13 @@ def plot_transformation_elastic(example_xs, example_ys, example_y_hats, xs, ys,
     color = colors[model_type]
     label = labels[model_type]
 
+    # move everything to the host once, matplotlib and scipy only read cpu data
+    example_xs, example_ys, xs, ys, y_hats = example_xs.cpu(), example_ys.cpu(), xs.cpu(), ys.cpu(), y_hats.cpu()
+
     for row in range(example_xs.shape[0]):
         # plot the forcing function
         ax = fig.add_subplot(gridspec_left[0, 0])
-        ax.plot(example_ys[row].cpu(), example_xs[row].cpu())
+        ax.plot(example_ys[row], example_xs[row])
         ax.invert_xaxis()
         ax.set_title(f"(a) Forcing function", fontsize=25, y=-0.2)
         ax.set_yticks([1.0, 0.5, 0.0])
@@ -350,26 +360,28 @@ def plot_transformation_elastic(example_xs, example_ys, example_y_hats, xs, ys,
         vmax = ys[row].max().item()
 
         # fetch data
-        xx, yy = xs[row, :, 0].cpu(), xs[row, :, 1].cpu()
+        xx, yy = xs[row, :, 0], xs[row, :, 1]
         groundtruth_displacement_x = ys[row, :, 0]
         
         # plot details
         image_density = 200j
-        grid_x, grid_y = np.mgrid[-xx.min().cpu().item():xx.max().cpu().item():image_density, 
-                                  -yy.min().cpu().item():yy.max().cpu().item():image_density]
-        points = np.array([xx.flatten().cpu(), yy.flatten().cpu()]).T
+        grid_x, grid_y = np.mgrid[-xx.min().item():xx.max().item():image_density, 
+                                  -yy.min().item():yy.max().item():image_density]
+        points = np.array([xx.flatten(), yy.flatten()]).T
+
+        # triangulate once, the three fields below only differ in their values on the same points
+        tri = Delaunay(points)
+
+        # every field in this row is plotted on the same grid, so the hole mask is computed once
+        hole = (grid_x - 0.5) ** 2 + (grid_y - 0.5) ** 2 < 0.25 ** 2
 
 
         # get colors
         intensity = groundtruth_displacement_x
-        grid_intensity = griddata(points, intensity.cpu(), (grid_x, grid_y), method='cubic')
+        grid_intensity = CloughTocher2DInterpolator(tri, intensity)(grid_x, grid_y)
 
         # remove the points inside the hole
-        for i in range(grid_x.shape[0]):
-            for j in range(grid_x.shape[1]):
-                distance = np.sqrt((grid_x[i, j] - 0.5) ** 2 + (grid_y[i, j] - 0.5) ** 2) # .min()
-                if distance < 0.25:
-                    grid_intensity[i, j] = np.nan
+        grid_intensity[hole] = np.nan
 
         # mesh plot
         ax = fig.add_subplot(gridspec_left[0, 1])
@@ -385,26 +397,15 @@ def plot_transformation_elastic(example_xs, example_ys, example_y_hats, xs, ys,
         ax.set_box_aspect(1)
 
         # fetch data
-        xx, yy = xs[row, :, 0].cpu(), xs[row, :, 1].cpu()
         estimated_displacement_x = y_hats[row, :, 0]
-        
-        # plot details
-        image_density = 200j
-        grid_x, grid_y = np.mgrid[-xx.min().cpu().item():xx.max().cpu().item():image_density, 
-                                  -yy.min().cpu().item():yy.max().cpu().item():image_density]
-        points = np.array([xx.flatten().cpu(), yy.flatten().cpu()]).T
 
 
         # get colors
         intensity = estimated_displacement_x
-        grid_intensity = griddata(points, intensity.cpu(), (grid_x, grid_y), method='cubic')
+        grid_intensity = CloughTocher2DInterpolator(tri, intensity)(grid_x, grid_y)
 
         # remove the points inside the hole
-        for i in range(grid_x.shape[0]):
-            for j in range(grid_x.shape[1]):
-                distance = np.sqrt((grid_x[i, j] - 0.5) ** 2 + (grid_y[i, j] - 0.5) ** 2) # .min()
-                if distance < 0.25:
-                    grid_intensity[i, j] = np.nan
+        grid_intensity[hole] = np.nan
 
         # mesh plot
         ax = fig.add_subplot(gridspec_left[0, 2])
@@ -432,30 +433,19 @@ def plot_transformation_elastic(example_xs, example_ys, example_y_hats, xs, ys,
         # now compute the difference between y_hats and y
         # then plot the same way
         # fetch data
-        xx, yy = xs[row, :, 0].cpu(), xs[row, :, 1].cpu()
         groundtruth_displacement_x = ys[row, :, 0]
         predicted_displacement_x = y_hats[row, :, 0]
         # Calculate relative error as percentage
         max_displacement = groundtruth_displacement_x.abs().max()
         difference = (groundtruth_displacement_x - predicted_displacement_x).abs() / max_displacement * 100
 
-        # plot details
-        image_density = 200j
-        grid_x, grid_y = np.mgrid[-xx.min().cpu().item():xx.max().cpu().item():image_density, 
-                                  -yy.min().cpu().item():yy.max().item():image_density]
-        points = np.array([xx.flatten().cpu(), yy.flatten().cpu()]).T
-
 
         # get colors
         intensity = difference
-        grid_intensity = griddata(points, intensity.cpu(), (grid_x, grid_y), method='cubic')
+        grid_intensity = CloughTocher2DInterpolator(tri, intensity)(grid_x, grid_y)
 
         # remove the points inside the hole
-        for i in range(grid_x.shape[0]):
-            for j in range(grid_x.shape[1]):
-                distance = np.sqrt((grid_x[i, j] - 0.5) ** 2 + (grid_y[i, j] - 0.5) ** 2) # .min()
-                if distance < 0.25:
-                    grid_intensity[i, j] = np.nan
+        grid_intensity[hole] = np.nan
 
 
 
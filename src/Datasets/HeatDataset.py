@@ -1,10 +1,17 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import scipy
+import scipy.io
 import torch
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.OperatorDataset import OperatorDataset
+
+
+# parses the train or test .mat file of this dataset
+def load_heat_mat(test:bool) -> dict:
+    return scipy.io.loadmat(f"./src/Datasets/Heat/heatequation_{'test' if test else 'train'}.mat")
+
+
 plt.rcParams.update({'font.size': 12})
 plt.rc('text', usetex=True)
 plt.rcParams["font.family"] = "Times New Roman"
@@ -20,14 +27,14 @@ plt.rcParams["font.family"] = "Times New Roman"
 # pass
 
 class HeatSrcDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_heat_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Heat/heatequation_test.mat')
             temperature_tag = "f_test"
             alpha_tag = "alpha_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Heat/heatequation_train.mat')
             temperature_tag = "f_train"
             alpha_tag = "alpha_train"
 
@@ -53,8 +60,8 @@ class HeatSrcDataset(OperatorDataset):
                          )
 
         # normalization, hard-coded constants for consistency
-        self.xs = torch.tensor(xs).to(torch.float32).to(device)
-        self.ys = torch.tensor(ys).to(torch.float32).to(device)
+        self.xs = torch.as_tensor(xs).to(torch.float32).to(device)
+        self.ys = torch.as_tensor(ys).to(torch.float32).to(device)
         self.device = device
 
     def sample_info(self) -> dict:
@@ -74,13 +81,13 @@ class HeatSrcDataset(OperatorDataset):
         return ys
 
 class HeatTgtDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_heat_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/Heat/heatequation_test.mat')
             u_tag = "u_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/Heat/heatequation_train.mat')
             u_tag = "u_train"
 
         # get the input space, x pos, y pos, and time
@@ -121,8 +128,8 @@ class HeatTgtDataset(OperatorDataset):
         std = 0.2342301309108734
         ys = ys / std
 
-        self.xs = torch.tensor(xs).to(torch.float32).to(device)
-        self.ys = torch.tensor(ys).to(torch.float32).to(device)
+        self.xs = torch.as_tensor(xs).to(torch.float32).to(device)
+        self.ys = torch.as_tensor(ys).to(torch.float32).to(device)
         self.sample_indicies = None
         self.device = device
 
@@ -7,7 +7,14 @@ from src.Datasets.OperatorDataset import OperatorDataset
 plt.rcParams.update({'font.size': 12})
 plt.rc('text', usetex=True)
 plt.rcParams["font.family"] = "Times New Roman"
-from plotting_specs import colors, labels, titles
+
+
+def quadratic_integral(As, Bs, Cs, xs):
+    # returns the integral of a quadratic function ax^2 + bx + c, in Horner form: ((a/3 x + b/2) x + c) x
+    # evaluated in fp32 even if the data is stored in a lower precision, the cubic term needs the mantissa bits
+    As, Bs, Cs, inputs = As.float().unsqueeze(1), Bs.float().unsqueeze(1), Cs.float().unsqueeze(1), xs.float()
+    ys = ((1/3. * As * inputs + 1/2. * Bs) * inputs + Cs) * inputs
+    return ys.to(xs.dtype)
 
 class QuadraticIntegralDataset(OperatorDataset):
 
@@ -16,6 +23,8 @@ class QuadraticIntegralDataset(OperatorDataset):
                  b_range=(-3/5, 3/5),
                  c_range=(-3/5, 3/5),
                  input_range=(-10, 10),
+                 dtype=torch.float32,
+                 seed=None,
                  device="cuda",
                  *args,
                  **kwargs
@@ -25,29 +34,59 @@ class QuadraticIntegralDataset(OperatorDataset):
         self.b_range = torch.tensor(b_range, dtype=torch.float32, device=device)
         self.c_range = torch.tensor(c_range, dtype=torch.float32, device=device)
         self.input_range = torch.tensor(input_range, dtype=torch.float32, device=device)
+        self.input_bounds = float(input_range[0]), float(input_range[1]) # python floats, so uniform_ does not read them back from the device
+        self.dtype = dtype # dtype of the sampled data. bfloat16 halves the memory traffic, but the models expect float32 by default
         self.device = device
+        # a private generator makes the samples independent of every other use of the global rng.
+        # Without a seed the global rng is used, so torch.manual_seed still controls the samples (e.g. plot_only)
+        self.generator = torch.Generator(device=device).manual_seed(seed) if seed is not None else None
+
+        # lower bounds and widths of the a, b, c ranges, so all coefficients are drawn with a single rand
+        self.coefficient_low = torch.stack([self.a_range[0], self.b_range[0], self.c_range[0]]).to(dtype)
+        self.coefficient_scale = torch.stack([self.a_range[1] - self.a_range[0], self.b_range[1] - self.b_range[0], self.c_range[1] - self.c_range[0]]).to(dtype)
 
 
     # the info dict is used to generate data. So first we generate an info dict
     def sample_info(self) -> dict:
         # generate n_functions sets of coefficients
-        As = torch.rand((self.n_functions_per_sample, 1), dtype=torch.float32, device=self.device) * (self.a_range[1] - self.a_range[0]) + self.a_range[0]
-        Bs = torch.rand((self.n_functions_per_sample, 1), dtype=torch.float32, device=self.device) * (self.b_range[1] - self.b_range[0]) + self.b_range[0]
-        Cs = torch.rand((self.n_functions_per_sample, 1), dtype=torch.float32, device=self.device) * (self.c_range[1] - self.c_range[0]) + self.c_range[0]
+        coefficients = torch.rand((self.n_functions_per_sample, 3), dtype=self.dtype, device=self.device, generator=self.generator)
+        coefficients = torch.addcmul(self.coefficient_low, coefficients, self.coefficient_scale)
+        As, Bs, Cs = coefficients.split(1, dim=1)
 
         return {"As": As, "Bs": Bs, "Cs": Cs}
 
     # this function is used to generate the data
     def sample_inputs(self, info, n_samples) -> torch.tensor:
-        xs = torch.rand((info["As"].shape[0], n_samples, *self.input_size), dtype=torch.float32, device=self.device)
-        xs = xs * (self.input_range[1] - self.input_range[0]) + self.input_range[0]
+        # uniform_ draws directly in the input range, without a separate scale and shift pass
+        xs = torch.empty((info["As"].shape[0], n_samples, *self.input_size), dtype=self.dtype, device=self.device).uniform_(*self.input_bounds, generator=self.generator)
         return xs
 
-    def compute_outputs(self, info, inputs) -> torch.tensor:
-        # returns the integral of a quadratic function ax^2 + bx + c
-        As, Bs, Cs = info["As"], info["Bs"], info["Cs"]
-        ys = 1/3. * As.unsqueeze(1) * inputs ** 3 + 1/2. * Bs.unsqueeze(1) * inputs ** 2 + Cs.unsqueeze(1) * inputs
-        return ys
+    # out can be a caller owned float32 buffer shaped like inputs, which is then overwritten instead of allocating ys
+    def compute_outputs(self, info, inputs, out:torch.tensor = None) -> torch.tensor:
+        if out is None:
+            return quadratic_integral(info["As"], info["Bs"], info["Cs"], inputs)
+
+        # the chain below reads inputs after out has been overwritten, and it accumulates in out, so out has to be
+        # a separate fp32 buffer to match quadratic_integral
+        if out.dtype != torch.float32:
+            raise ValueError(f"out must be float32, got {out.dtype}")
+        if out.untyped_storage().data_ptr() == inputs.untyped_storage().data_ptr():
+            raise ValueError("out must not share memory with inputs")
+
+        # same Horner form as quadratic_integral, but every step writes into out. The fp32 coefficients and out
+        # promote every op to fp32, even for lower precision inputs
+        As, Bs, Cs = info["As"].float().unsqueeze(1), info["Bs"].float().unsqueeze(1), info["Cs"].float().unsqueeze(1)
+        torch.mul(inputs, As, out=out).mul_(1/3.).add_(Bs, alpha=1/2.).mul_(inputs).add_(Cs).mul_(inputs)
+        return out
+
+    # samples new functions and evaluates them at n_samples random inputs, without the example/query split of sample.
+    # the coefficients go straight from the rng to quadratic_integral, no info dict is built
+    def generate_batch(self, n_samples) -> Tuple[torch.tensor, torch.tensor]:
+        coefficients = torch.rand((self.n_functions_per_sample, 3), dtype=self.dtype, device=self.device, generator=self.generator)
+        As, Bs, Cs = torch.addcmul(self.coefficient_low, coefficients, self.coefficient_scale).split(1, dim=1)
+        xs = torch.empty((self.n_functions_per_sample, n_samples, *self.input_size), dtype=self.dtype, device=self.device).uniform_(*self.input_bounds, generator=self.generator)
+        ys = quadratic_integral(As, Bs, Cs, xs)
+        return xs, ys
 
 def plot_target_quadratic_integral(xs, ys, y_hats, info, logdir):
     # sort xs,ys,y_hats
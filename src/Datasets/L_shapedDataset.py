@@ -1,11 +1,18 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import scipy
+import scipy.io
 import torch
 from scipy.interpolate import griddata
 from plotting_specs import colors, labels, titles
 
 from src.Datasets.OperatorDataset import OperatorDataset
+
+
+# parses the train or test .mat file of this dataset
+def load_L_mat(test:bool) -> dict:
+    return scipy.io.loadmat(f"./src/Datasets/L-Shaped/linearDarcy_{'test' if test else 'train'}.mat")
+
+
 plt.rcParams.update({'font.size': 16})
 plt.rc('text', usetex=True)
 plt.rcParams["font.family"] = "Times New Roman"
@@ -38,13 +45,13 @@ plt.rcParams["font.family"] = "Times New Roman"
 
 
 class LSrcDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda",*args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda",*args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_L_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/L-Shaped/linearDarcy_test.mat')
             tags = "f1_test" , "f2_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/L-Shaped/linearDarcy_train.mat')
             tags = "f1_train", "f2_train"
 
         # fetch data
@@ -120,13 +127,13 @@ class LSrcDataset(OperatorDataset):
         return ys
 
 class LTgtDataset(OperatorDataset):
-    def __init__(self, test=False, device="cuda", *args, **kwargs):
-        # load data
+    def __init__(self, test=False, mat=None, device="cuda", *args, **kwargs):
+        # load data. get_dataset parses the file once and passes it to both datasets of the pair
+        if mat is None:
+            mat = load_L_mat(test)
         if test:
-            mat = scipy.io.loadmat('./src/Datasets/L-Shaped/linearDarcy_test.mat')
             tag = "u_test"
         else:
-            mat = scipy.io.loadmat('./src/Datasets/L-Shaped/linearDarcy_train.mat')
             tag = "u_train"
 
         # fetch data
@@ -1,13 +1,8 @@
+import math
 from typing import Tuple, Union
-from plotting_specs import colors, labels, titles
 
 import torch
-from matplotlib import pyplot as plt
 from src.Datasets.OperatorDataset import OperatorDataset
-plt.rcParams.update({'font.size': 12})
-plt.rc('text', usetex=True)
-plt.rcParams["font.family"] = "Times New Roman"
-from plotting_specs import colors, labels, titles
 
 class QuadraticIntegralDataset(OperatorDataset):
 
@@ -16,17 +11,31 @@ class QuadraticIntegralDataset(OperatorDataset):
                  b_range=(-3/5, 3/5),
                  c_range=(-3/5, 3/5),
                  input_ranges=[(-10, 2), (8, 10)],
+                 shuffle_samples=True,
                  device="cuda",
                  *args,
                  **kwargs
                  ):
         super().__init__(input_size=(1,), output_size=(1,), *args, **kwargs)
+        # checked once here, sampling assumes finite (low, high) pairs and a non-empty list of input ranges
+        for name, r in (("a_range", a_range), ("b_range", b_range), ("c_range", c_range)):
+            if len(r) != 2 or not all(math.isfinite(v) for v in r) or r[0] > r[1]:
+                raise ValueError(f"{name} must be a finite (low, high) pair with low <= high, got {r}")
+        if len(input_ranges) == 0 or any(len(r) != 2 or not all(math.isfinite(v) for v in r) or r[0] >= r[1] for r in input_ranges):
+            raise ValueError(f"input_ranges must be a non-empty list of finite (low, high) pairs with low < high, got {input_ranges}")
         self.a_range = torch.tensor(a_range, dtype=torch.float32, device=device)
         self.b_range = torch.tensor(b_range, dtype=torch.float32, device=device)
         self.c_range = torch.tensor(c_range, dtype=torch.float32, device=device)
         self.input_ranges = [torch.tensor(r, dtype=torch.float32, device=device) for r in input_ranges]
+        self.shuffle_samples = shuffle_samples # otherwise samples are ordered by range, which the least squares fit does not care about
         self.device = device
 
+        # lower bounds and widths of the input ranges, so all ranges are sampled with a single rand
+        self.range_low = torch.stack([r[0] for r in self.input_ranges])
+        self.range_scale = torch.stack([r[1] - r[0] for r in self.input_ranges])
+        self.range_ids = torch.arange(len(self.input_ranges), device=device)
+        self.range_indicies = {} # n_samples -> range of each sample. n_samples only takes the example and point counts
+
 
     # the info dict is used to generate data. So first we generate an info dict
     def sample_info(self) -> dict:
@@ -39,30 +48,26 @@ class QuadraticIntegralDataset(OperatorDataset):
 
     # this function is used to generate the data
     def sample_inputs(self, info, n_samples) -> torch.tensor:
-        # Determine the number of samples per range
-        n_ranges = len(self.input_ranges)
-        samples_per_range = n_samples // n_ranges
-        remainder = n_samples % n_ranges
+        # Determine the number of samples per range, once per n_samples
+        # the first n_samples % n_ranges ranges get one extra sample
+        if n_samples not in self.range_indicies:
+            n_ranges = len(self.input_ranges)
+            counts = (self.range_ids < n_samples % n_ranges) + n_samples // n_ranges
+            self.range_indicies[n_samples] = torch.repeat_interleave(self.range_ids, counts, output_size=n_samples)
 
-        samples = []
-        for i, r in enumerate(self.input_ranges):
-            # Allocate remaining samples to the last range
-            current_samples = samples_per_range + (1 if i < remainder else 0)
-            if current_samples > 0:
-                xs = torch.rand((info["As"].shape[0], current_samples, *self.input_size), dtype=torch.float32, device=self.device)
-                xs = xs * (r[1] - r[0]) + r[0]
-                samples.append(xs)
+        # the range each sample is drawn from. Shuffling these indicies mixes the ranges along the sample dimension
+        # without gathering the samples themselves
+        range_indicies = self.range_indicies[n_samples]
+        if self.shuffle_samples:
+            range_indicies = range_indicies[torch.randperm(n_samples, device=self.device)]
 
-        # Concatenate samples from all ranges
-        xs = torch.cat(samples, dim=1)
-        
-        # Shuffle the samples to ensure randomness
-        indices = torch.randperm(xs.shape[1])
-        xs = xs[:, indices]
+        xs = torch.rand((info["As"].shape[0], n_samples, *self.input_size), dtype=torch.float32, device=self.device)
+        xs = torch.addcmul(self.range_low[range_indicies].view(1, -1, 1), xs, self.range_scale[range_indicies].view(1, -1, 1))
         return xs
 
     def compute_outputs(self, info, inputs) -> torch.tensor:
         # returns the integral of a quadratic function ax^2 + bx + c
         As, Bs, Cs = info["As"], info["Bs"], info["Cs"]
-        ys = 1/3. * As.unsqueeze(1) * inputs ** 3 + 1/2. * Bs.unsqueeze(1) * inputs ** 2 + Cs.unsqueeze(1) * inputs
+        # Horner form with plain multiplies, ((a/3 x + b/2) x + c) x. Integer ** dispatches to pow
+        ys = ((1/3. * As.unsqueeze(1) * inputs + 1/2. * Bs.unsqueeze(1)) * inputs + Cs.unsqueeze(1)) * inputs
         return ys
\ No newline at end of file
@@ -4,6 +4,7 @@ import torch
 
 from FunctionEncoder.Dataset.BaseDataset import BaseDataset
 
+
 class OperatorDataset(BaseDataset):
     def __init__(self,   input_size:Tuple[int],
                          output_size:Tuple[int],
@@ -172,6 +173,20 @@ class CombinedDataset(BaseDataset):
 
         return example_xs, example_ys, xs, ys, info
 
+    def sample_batch(self, n_draws:int, device: Union[str, torch.device], out:Tuple[torch.tensor, torch.tensor, torch.tensor, torch.tensor] = None) -> Tuple[torch.tensor,
+                                                                       torch.tensor,
+                                                                       torch.tensor,
+                                                                       torch.tensor,
+                                                                       dict]:
+        # draws n_draws batches and concatenates them along the function dimension,
+        # so a model can evaluate all of them in a single forward pass.
+        # out can be the data tensors of a previous call, which are then overwritten instead of allocating new ones
+        samples = [self.sample(device) for _ in range(n_draws)]
+        out = out if out is not None else (None, None, None, None)
+        example_xs, example_ys, xs, ys = (torch.cat([sample[i] for sample in samples], dim=0, out=out[i]) for i in range(4))
+        info = {key: torch.cat([sample[4][key] for sample in samples], dim=0) for key in samples[0][4]}
+        return example_xs, example_ys, xs, ys, info
+
 
     def check_dataset(self):
         pass # we are doing exotic things, so this check does not apply.